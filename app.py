@@ -1,5 +1,5 @@
 import os
-from flask import Flask, redirect, url_for
+from flask import Flask, Response, redirect, url_for
 from flask_login import LoginManager, current_user
 from models import init_db, db
 from models.user import User
@@ -8,6 +8,8 @@ from views.scraping import scraping_bp
 from views.companies import companies_bp
 from views.graphs import graphs_bp
 from views.faq import faq_bp 
+from commands import register_commands
+from services.instrumentation import REGISTRY
 
 app = Flask(__name__)
 
@@ -20,6 +22,7 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["JSON_AS_ASCII"] = False
 
 init_db(app)
+register_commands(app)
 
 login_manager = LoginManager(app)
 login_manager.login_view = "auth.login"
@@ -44,6 +47,11 @@ def index():
 def healthz():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    # Prometheus 形式（プロセス内のクロール計測値）
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 7700))
     app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
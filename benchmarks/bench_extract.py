@@ -0,0 +1,106 @@
+import argparse, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.extractor import extract_fields, extract_fields_bs4
+
+# ======================================================
+# 抽出エンジンのベンチマーク
+#   python benchmarks/bench_extract.py [--repeat 20] [--corpus benchmarks/corpus]
+#   ・corpus 内の保存済み企業HP（建設業）に対して lxml 版と従来の bs4 版を比較
+#   ・pages/sec とページ単位のピークメモリ（tracemalloc）を出力
+#   ・両者の抽出結果が 1 項目でも異なれば終了コード 1（KNOWN_DIFFS に記載した意図的な違いを除く）
+# ======================================================
+
+BASE_URL = "https://www.example.co.jp/"
+EXTRACTORS = [
+    ("bs4 (html.parser)", extract_fields_bs4),
+    ("lxml single-pass", extract_fields),
+]
+
+# 意図的に従来実装と結果を変えている項目: (ファイル, 項目) -> (lxml 版の期待値, 理由)
+KNOWN_DIFFS = {
+    ("13_unclosed_dt_dd.html", "address"): (
+        "〒420-0000 静岡県静岡市葵区example町1-2-3",
+        "html.parser は閉じていない dt / dd を入れ子にするため、bs4 版は所在地以降の全項目を住所として返す"
+        "（lxml 版は HTML の仕様どおり次の dt / dd で閉じる）",
+    ),
+}
+
+
+def load_corpus(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), encoding="utf-8", newline="") as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def check_equal(pages):
+    diffs, known = [], []
+    for name, html in pages:
+        old = extract_fields_bs4(html, BASE_URL)
+        new = extract_fields(html, BASE_URL)
+        for k in old:
+            expected = KNOWN_DIFFS.get((name, k))
+            if expected and new[k] == expected[0]:
+                known.append((name, k, expected[1]))
+            elif old[k] != new[k]:
+                diffs.append((name, k, old[k], new[k]))
+    return diffs, known
+
+
+def measure_speed(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            fn(html, BASE_URL)
+    elapsed = time.perf_counter() - start
+    return len(pages) * repeat / elapsed
+
+
+def measure_peak(fn, pages):
+    peak = 0
+    for _, html in pages:
+        tracemalloc.start()
+        fn(html, BASE_URL)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    total_kb = sum(len(h.encode("utf-8")) for _, h in pages) / 1024
+    print(f"corpus: {len(pages)} pages / {total_kb:.1f} KB / repeat={args.repeat}")
+
+    diffs, known = check_equal(pages)
+    for name, field, reason in known:
+        print(f"  KNOWN {name} {field}: {reason}")
+    for name, field, old, new in diffs:
+        print(f"  DIFF {name} {field}: bs4={old!r} lxml={new!r}")
+    print(f"field mismatches: {len(diffs)} (known differences: {len(known)})")
+
+    print(f"{'extractor':<20} {'pages/sec':>10} {'peak KB/page':>13}")
+    results = {}
+    for label, fn in EXTRACTORS:
+        fn(pages[0][1], BASE_URL)  # warm up
+        pps = measure_speed(fn, pages, args.repeat)
+        peak = measure_peak(fn, pages)
+        results[label] = pps
+        print(f"{label:<20} {pps:>10.1f} {peak / 1024:>13.1f}")
+
+    base, new = results[EXTRACTORS[0][0]], results[EXTRACTORS[1][0]]
+    print(f"speedup: x{new / base:.2f}")
+
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import argparse, multiprocessing, os, sys, time, tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from services.fetcher import MAX_BODY_BYTES, NotHtml, decode_html, read_body
+
+# ======================================================
+# 本文取得（ストリーム読み込み + 文字コード判定）のベンチマーク
+#   python benchmarks/bench_fetch.py [--repeat 5]
+#   ・別プロセスのローカルサーバーから、文字コード / サイズ / Content-Type の違うページを取得
+#       従来: 全文をダウンロード → r.apparent_encoding（全文で文字コード推定）→ r.text
+#       新  : stream=True → read_body（HTML 以外は打ち切り / 上限まで）→ decode_html
+#   ・ページごとの CPU 時間（クライアント側のみ）とピークメモリ（tracemalloc）を出力
+#   ・新方式で HTML の本文が正しく読めない（文字化け）場合は終了コード 1
+# ======================================================
+
+MARKER = "株式会社テスト建設"
+
+
+def _listing(size):
+    rows = []
+    total = 0
+    i = 0
+    while total < size:
+        row = (f"<li><a href='https://www.test{i}.co.jp/'>{MARKER}{i}</a>"
+               f" 〒100-0001 東京都千代田区千代田{i}丁目 TEL 03-1234-{i % 10000:04d} 建築・土木・リフォーム</li>\n")
+        rows.append(row)
+        total += len(row) * 2
+        i += 1
+    return "".join(rows)
+
+
+def _html(body, charset=None):
+    meta = f"<meta charset='{charset}'>" if charset else ""
+    return f"<!doctype html><html><head>{meta}<title>{MARKER}一覧</title></head><body><ul>{body}</ul></body></html>"
+
+
+def build_pages():
+    # name -> (Content-Type, bytes, HTML として読めるべきか)
+    small, large, huge = _listing(30 * 1024), _listing(1536 * 1024), _listing(MAX_BODY_BYTES * 3)
+    pages = {}
+    for size, body in (("30KB", small), ("1.5MB", large)):
+        pages[f"utf8-header-{size}"] = ("text/html; charset=utf-8", _html(body).encode("utf-8"), True)
+        pages[f"sjis-meta-{size}"] = ("text/html", _html(body, "Shift_JIS").encode("cp932"), True)
+        pages[f"eucjp-detect-{size}"] = ("text/html", _html(body).encode("euc_jp"), True)
+    pages["sjis-meta-over-cap"] = ("text/html", _html(huge, "Shift_JIS").encode("cp932"), True)
+    pages["pdf-2MB"] = ("application/pdf", b"%PDF-1.4\n" + os.urandom(2 * 1024 * 1024), False)
+    pages["jpeg-500KB"] = ("image/jpeg", b"\xff\xd8\xff\xe0" + os.urandom(500 * 1024), False)
+    return pages
+
+
+def _serve(pages, queue):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            content_type, data, _ = pages[self.path.lstrip("/")]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    queue.put(server.server_port)
+    server.serve_forever()
+
+
+def fetch_old(session, url):
+    r = session.get(url, timeout=30)
+    r.encoding = r.apparent_encoding or r.encoding
+    return r.text
+
+
+def fetch_new(session, url):
+    r = session.get(url, timeout=30, stream=True)
+    try:
+        body = read_body(r)
+    except NotHtml:
+        return None
+    return decode_html(body, r.headers.get("Content-Type"))[0]
+
+
+def measure(fn, session, url, repeat):
+    fn(session, url)  # 接続の確立 / warm up
+    cpu = time.process_time()
+    for _ in range(repeat):
+        text = fn(session, url)
+    cpu = (time.process_time() - cpu) / repeat
+    tracemalloc.start()
+    fn(session, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cpu, peak, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = build_pages()
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(pages, queue), daemon=True)
+    server.start()
+    base = f"http://127.0.0.1:{queue.get(timeout=10)}/"
+
+    session = requests.Session()
+    errors = []
+    totals = {"old": [0.0, 0], "new": [0.0, 0]}
+    print(f"{'page':<22} {'KB':>7} | {'old CPU ms':>10} {'old peak KB':>11} | {'new CPU ms':>10} {'new peak KB':>11}")
+    for name, (_, data, is_html) in pages.items():
+        old = measure(fetch_old, session, base + name, args.repeat)
+        new = measure(fetch_new, session, base + name, args.repeat)
+        print(f"{name:<22} {len(data) / 1024:>7.0f} | {old[0] * 1000:>10.1f} {old[1] / 1024:>11.0f} | "
+              f"{new[0] * 1000:>10.1f} {new[1] / 1024:>11.0f}")
+        for key, result in (("old", old), ("new", new)):
+            totals[key][0] += result[0]
+            totals[key][1] = max(totals[key][1], result[1])
+        text = new[2]
+        if is_html and (text is None or f"{MARKER}1<" not in text):
+            errors.append(f"{name}: decoded text does not contain the marker")
+        if not is_html and text is not None:
+            errors.append(f"{name}: non-HTML body was read")
+    server.terminate()
+
+    n = len(pages)
+    print(f"{'mean CPU / max peak':<22} {'':>7} | {totals['old'][0] * 1000 / n:>10.1f} {totals['old'][1] / 1024:>11.0f} | "
+          f"{totals['new'][0] * 1000 / n:>10.1f} {totals['new'][1] / 1024:>11.0f}")
+    for e in errors:
+        print(f"  NG: {e}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ======================================================
+# 記録したクロールを再生するベンチマーク
+#   python benchmarks/bench_replay.py instance/crawl_archive/<crawl_id>.jsonl.gz
+#          [--latency recorded|0.05] [--concurrency 1,8] [--strict]
+#   ・記録時（crawl_and_export(record=True) / 画面の「取得したページを記録する」）と同じ条件で
+#     crawl_and_export を最初から最後まで実行し、取得はすべてアーカイブから返す（ネットワークに出ない）
+#   ・所要時間 / pages/sec と、記録時の抽出結果との差分（欠落 / 追加 / 項目の違い）を出力
+#   ・一時 SQLite と一時ディレクトリで実行するため、本番 DB やカレントディレクトリには書き込まない
+#   ・--strict の場合、差分があれば終了コード 1
+# ======================================================
+
+FIELDS = ["company_name", "contact_url", "email", "phone", "address"]
+
+
+def setup():
+    workdir = tempfile.mkdtemp()
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench_replay.db')}"
+    os.environ.setdefault("HTTP_CACHE_ENABLED", "0")
+
+    from app import app
+    from models import db
+    import models.company, models.metrics, models.log, models.dedup  # noqa: F401 （テーブル定義の登録）
+
+    with app.app_context():
+        db.create_all()
+    return app, workdir
+
+
+def run(app, reader, concurrency):
+    from models import db
+    from models.company import Company
+    from services.scraper import crawl_and_export
+
+    params = dict(reader.info.get("params") or {})
+    with app.app_context():
+        db.session.query(Company).delete()
+        db.session.commit()
+        stats = {}
+        start = time.perf_counter()
+        crawl_and_export(reader.info["seed_url"], **params, concurrency=concurrency, replay=reader, stats=stats)
+        elapsed = time.perf_counter() - start
+    return elapsed, stats
+
+
+def diff_rows(expected, actual):
+    key = lambda r: r.get("homepage_url") or r.get("source_url")
+    old = {key(r): r for r in expected}
+    new = {key(r): r for r in actual}
+    missing = sorted(set(old) - set(new))
+    extra = sorted(set(new) - set(old))
+    changed = [
+        (k, f, old[k].get(f), new[k].get(f))
+        for k in sorted(set(old) & set(new)) for f in FIELDS if (old[k].get(f) or "") != (new[k].get(f) or "")
+    ]
+    return missing, extra, changed
+
+
+def read_csv(path):
+    import csv
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("archive")
+    parser.add_argument("--latency", default=None, help="recorded（記録時の所要時間）または秒数")
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+
+    app, workdir = setup()
+    from services.archive import ArchiveReader
+
+    latency = args.latency if args.latency in (None, "recorded") else float(args.latency)
+    reader = ArchiveReader(os.path.abspath(args.archive), latency)
+    print(f"archive: {args.archive} / responses={len(reader)} / seed={reader.info.get('seed_url')}")
+    if reader.rows is None:
+        print("  (記録時の抽出結果が無いため差分は比較しません)")
+
+    os.chdir(workdir)
+    failed = False
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        elapsed, stats = run(app, reader, c)
+        fetches = stats.get("fetches", 0)
+        print(f"concurrency={c:<3} {elapsed:7.2f}s  {stats.get('pages_visited', 0) / elapsed:8.1f} pages/sec  "
+              f"{fetches / elapsed:8.1f} fetches/sec  companies={stats.get('total', 0)} "
+              f"fetch_errors={stats.get('fetch_errors', 0)}")
+        if reader.rows is None:
+            continue
+        missing, extra, changed = diff_rows(reader.rows, read_csv(stats["last_file"]))
+        print(f"  diff: missing={len(missing)} extra={len(extra)} changed={len(changed)}")
+        for k in missing[:10]:
+            print(f"    - {k}")
+        for k in extra[:10]:
+            print(f"    + {k}")
+        for k, f, old, new in changed[:20]:
+            print(f"    ~ {k} {f}: {old!r} -> {new!r}")
+        failed = failed or bool(missing or extra or changed)
+    return 1 if failed and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
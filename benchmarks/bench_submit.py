@@ -0,0 +1,100 @@
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ======================================================
+# フォーム送信エンジンのベンチマーク
+#   python benchmarks/bench_submit.py [--companies 200] [--concurrency 1,4,8] [--latency 0.05]
+#   ・ローカルのフォームサーバー（benchmarks/form_server.py）に対して送信し、件数/秒を出力
+#   ・一時 SQLite に企業を登録して実行するため、本番 DB には触れない
+#   ・同じ企業へ 2 回以上送信された / CAPTCHA のフォームに送信された / 2 回目の実行で送信された
+#     場合は終了コード 1（冪等性の確認）
+#   ・Playwright と Chromium が必要（pip install playwright && playwright install chromium）
+# ======================================================
+
+MESSAGE = {
+    "company": "株式会社サンプル",
+    "name": "山田 太郎",
+    "kana": "ヤマダ タロウ",
+    "email": "taro@example.com",
+    "phone": "03-0000-0000",
+    "subject": "ご提案",
+    "body": "{company_name} ご担当者様\nベンチマーク用の送信です。",
+}
+
+
+def setup(companies, latency):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_submit.db")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+
+    import form_server
+    from app import app
+    from models import db
+    from models.company import Company
+
+    server = form_server.start(0, latency)
+    port = server.server_port
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(
+            Company(company_name=f"テスト建設{n}", company_site=f"http://c{n}.localhost:{port}/",
+                    inquiry_url=f"http://c{n}.localhost:{port}/contact")
+            for n in range(companies)
+        )
+        db.session.commit()
+    return app, server
+
+
+def run(app, companies, concurrency):
+    import form_server
+    from models import db
+    from models.submission import Submission
+    from services.playwright_submit import run_submissions
+
+    with app.app_context():
+        db.session.query(Submission).delete()
+        db.session.commit()
+        form_server.SUBMISSIONS.clear()
+
+        start = time.perf_counter()
+        stats = run_submissions(MESSAGE, concurrency=concurrency, host_interval=0)
+        elapsed = time.perf_counter() - start
+        again = run_submissions(MESSAGE, concurrency=concurrency, host_interval=0)
+
+    errors = []
+    dupes = [n for n, forms in form_server.SUBMISSIONS.items() if len(forms) > 1]
+    if dupes:
+        errors.append(f"duplicate submissions: {dupes[:10]}")
+    captcha = [n for n in form_server.SUBMISSIONS if n % 10 == 9]
+    if captcha:
+        errors.append(f"submitted through captcha: {captcha[:10]}")
+    if again["sent"]:
+        errors.append(f"second run sent {again['sent']}")
+    expected = sum(1 for n in range(companies) if n % 10 != 9)
+    if stats["sent"] != expected:
+        errors.append(f"sent {stats['sent']} / expected {expected} ({stats})")
+    return companies / elapsed, stats, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    app, server = setup(args.companies, args.latency)
+    failed = False
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        rate, stats, errors = run(app, args.companies, c)
+        print(f"concurrency={c:<3} {rate:8.1f} forms/sec  sent={stats['sent']} skipped={stats['skipped']} "
+              f"failed={stats['failed']} unknown={stats['unknown']}")
+        for e in errors:
+            print(f"  NG: {e}")
+        failed = failed or bool(errors)
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse, html, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# ======================================================
+# 送信エンジン確認用のお問い合わせフォーム（ローカル専用）
+#   python benchmarks/form_server.py [--port 8765] [--latency 0.05]
+#   ・http://c<番号>.localhost:<port>/contact を企業ごとのフォームとして扱う
+#     （*.localhost は Chromium がループバックに解決するため、ホスト単位の制御も確認できる）
+#   ・番号によってレイアウトを変える
+#       偶数: table レイアウト + 確認画面あり / 奇数: dl レイアウト + 直接送信
+#       3 の倍数: 必須の同意チェックボックス + 問い合わせ種別の select
+#       末尾 9: reCAPTCHA あり（送信されないこと）
+#   ・受け付けた送信は SUBMISSIONS に企業番号ごとに記録（二重送信の確認用）
+# ======================================================
+
+SUBMISSIONS = {}
+_lock = threading.Lock()
+_HOST_RE = re.compile(r"^c(\d+)\.")
+
+_FIELDS_TABLE = """
+<table>
+<tr><th>会社名 <span>必須</span></th><td><input name="company" required></td></tr>
+<tr><th>お名前 <span>必須</span></th><td><input name="your-name" required></td></tr>
+<tr><th>メールアドレス <span>必須</span></th><td><input type="email" name="your-email" required></td></tr>
+<tr><th>メールアドレス（確認用）</th><td><input type="email" name="your-email-confirm" required></td></tr>
+<tr><th>電話番号</th><td><input name="tel"></td></tr>
+<tr><th>お問い合わせ内容 <span>必須</span></th><td><textarea name="message" required></textarea></td></tr>
+</table>
+"""
+
+_FIELDS_DL = """
+<dl>
+<dt>貴社名</dt><dd><input name="f1" required></dd>
+<dt>ご担当者名</dt><dd><input name="f2" required></dd>
+<dt>フリガナ</dt><dd><input name="f3"></dd>
+<dt>E-mail</dt><dd><input name="f4" required></dd>
+<dt>TEL</dt><dd><input type="tel" name="f5"></dd>
+<dt>ご用件</dt><dd><textarea name="f6" required></textarea></dd>
+</dl>
+"""
+
+_EXTRAS = """
+<p><select name="category" required><option value="">選択してください</option>
+<option value="product">製品について</option><option value="other">その他</option></select></p>
+<p><label><input type="checkbox" name="agree" value="1" required> 個人情報の取り扱いに同意する</label></p>
+"""
+
+_CAPTCHA = '<div class="g-recaptcha" data-sitekey="test"></div>'
+
+
+def _page(title, body):
+    return f"<!doctype html><html><head><meta charset='utf-8'><title>{title}</title></head><body>{body}</body></html>"
+
+
+class FormHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _company(self):
+        m = _HOST_RE.match(self.headers.get("Host", ""))
+        return int(m.group(1)) if m else 0
+
+    def _send(self, status, body):
+        time.sleep(self.latency)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        n = self._company()
+        if self.path.startswith("/contact"):
+            fields = _FIELDS_TABLE if n % 2 == 0 else _FIELDS_DL
+            extras = _EXTRAS if n % 3 == 0 else ""
+            captcha = _CAPTCHA if n % 10 == 9 else ""
+            action = "/confirm" if n % 2 == 0 else "/send"
+            button = "確認画面へ" if n % 2 == 0 else "送信する"
+            return self._send(200, _page(
+                f"お問い合わせ | テスト建設{n}",
+                f"<h1>お問い合わせ</h1><form method='post' action='{action}'>{fields}{extras}{captcha}"
+                f"<button type='submit'>{button}</button></form>",
+            ))
+        if self.path.startswith("/thanks"):
+            return self._send(200, _page("送信完了", "<p>お問い合わせありがとうございました。</p>"))
+        self._send(404, _page("Not Found", "not found"))
+
+    def do_POST(self):
+        n = self._company()
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        if self.path.startswith("/confirm"):
+            hidden = "".join(
+                f"<input type='hidden' name='{html.escape(k)}' value='{html.escape(v[0])}'>" for k, v in form.items()
+            )
+            rows = "".join(f"<tr><th>{html.escape(k)}</th><td>{html.escape(v[0])}</td></tr>" for k, v in form.items())
+            return self._send(200, _page("確認画面", (
+                f"<h1>入力内容の確認</h1><table>{rows}</table><form method='post' action='/send'>{hidden}"
+                "<button type='button' onclick='history.back()'>戻る</button>"
+                "<button type='submit'>送信する</button></form>"
+            )))
+        if self.path.startswith("/send"):
+            if not any(v[0].strip() for k, v in form.items() if k in ("message", "f6")):
+                return self._send(400, _page("エラー", "<p>お問い合わせ内容を入力してください</p>"))
+            with _lock:
+                SUBMISSIONS.setdefault(n, []).append(form)
+            self.send_response(303)
+            self.send_header("Location", "/thanks")
+            self.end_headers()
+            return
+        self._send(404, _page("Not Found", "not found"))
+
+
+def start(port=0, latency=0.0):
+    handler = type("Handler", (FormHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = start(args.port, args.latency)
+    print(f"form server: http://c1.localhost:{server.server_port}/contact")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
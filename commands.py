@@ -0,0 +1,96 @@
+import csv, json
+import click
+from models import db
+
+def register_commands(app):
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """未作成のテーブルを作成する"""
+        import models.user, models.company, models.job, models.metrics, models.log, models.checkpoint, models.frontier, models.submission, models.dedup  # noqa: F401 （テーブル定義の登録）
+        from services.company_search import ensure_search_index
+        from services.checkpoint import ensure_state_column
+        from services.jobs import ensure_owner_column
+
+        db.create_all()
+        ensure_search_index()
+        ensure_state_column()
+        ensure_owner_column()
+        click.echo("テーブルと検索インデックスを作成しました")
+
+    @app.cli.command("import-companies")
+    @click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", type=int, default=None, help="1回の INSERT でまとめる件数")
+    def import_companies_command(paths, batch_size):
+        """crawl_and_export が出力した CSV を companies テーブルに取り込む"""
+        from services.company_store import CompanyWriter
+
+        writer = CompanyWriter(batch_size)
+        for path in paths:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    writer.add(row)
+        result = writer.close()
+        click.echo(f"inserted={result['inserted']} existed={result['existed']} failed={result['failed']}")
+
+    @app.cli.command("rebuild-metrics")
+    def rebuild_metrics_command():
+        """グラフ用の集計テーブルを既存データから作り直す"""
+        from services.metrics import rebuild
+
+        host_rows, crawl_days = rebuild()
+        click.echo(f"daily_host_stats={host_rows} daily_crawl_stats={crawl_days}")
+
+    @app.cli.command("dedup-companies")
+    @click.option("--batch-size", type=int, default=1000, help="1回の INSERT でまとめる件数")
+    def dedup_companies_command(batch_size):
+        """既存の企業データから重複判定（company_keys / company_duplicates）を作り直す"""
+        from services.dedup import rebuild
+
+        result = rebuild(batch_size)
+        click.echo(" ".join(f"{k}={v}" for k, v in result.items()))
+
+    @app.cli.command("resume-crawl")
+    @click.argument("job_id")
+    @click.option("--force", is_flag=True, help="実行中のまま止まって見えるジョブも再開する")
+    def resume_crawl_command(job_id, force):
+        """中断したクロールジョブをチェックポイントから再開する（フォアグラウンドで実行）"""
+        from services.jobs import get_job, resumable, _run
+        from services.distributed import is_distributed
+
+        job = get_job(job_id)
+        if not job:
+            raise click.ClickException("ジョブが見つかりません")
+        if is_distributed(job):
+            raise click.ClickException("分散クロールのジョブは flask crawl-worker で処理してください")
+        if not force and not resumable(job):
+            raise click.ClickException(f"再開できない状態です（status={job.status}）")
+        _run(app, job.id, resume=True)
+        db.session.refresh(job)
+        click.echo(f"status={job.status} total={job.total} csv={job.csv_path}")
+
+    @app.cli.command("crawl-worker")
+    @click.option("--threads", type=int, default=None, help="このプロセスで同時に処理する URL 数")
+    @click.option("--job", "job_id", default=None, help="指定したジョブのみ処理する")
+    @click.option("--exit-when-idle", is_flag=True, help="実行中の分散ジョブが無くなったら終了する")
+    def crawl_worker_command(threads, job_id, exit_when_idle):
+        """共有フロンティアから URL を取得して分散クロールを処理する"""
+        from services.distributed import run_worker
+
+        run_worker(app, threads=threads, crawl_id=job_id, exit_when_idle=exit_when_idle)
+
+    @app.cli.command("submit-forms")
+    @click.option("--message", "message_path", required=True, type=click.Path(exists=True, dir_okay=False),
+                  help="送信内容の JSON（company / name / kana / email / phone / zip / address / subject / body）")
+    @click.option("--concurrency", type=int, default=None, help="並列に開くブラウザコンテキスト数")
+    @click.option("--host-interval", type=float, default=None, help="同じホストへの送信間隔（秒）")
+    @click.option("--limit", type=int, default=None, help="今回送信する最大件数")
+    @click.option("--dry-run", is_flag=True, help="入力までを試し、送信ボタンは押さない")
+    def submit_forms_command(message_path, concurrency, host_interval, limit, dry_run):
+        """お問い合わせフォームへ一括送信する（送信済みの企業には再送しない）"""
+        from services.playwright_submit import run_submissions
+
+        with open(message_path, encoding="utf-8") as f:
+            message = json.load(f)
+        stats = run_submissions(message, concurrency, host_interval, limit, dry_run)
+        click.echo(" ".join(f"{k}={v}" for k, v in stats.items()))
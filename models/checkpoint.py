@@ -0,0 +1,14 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from models import db
+
+class CrawlCheckpoint(db.Model):
+    __tablename__ = "crawl_checkpoints"
+
+    crawl_id = db.Column(db.String(32), primary_key=True)
+    # MySQL の TEXT は 64KB まで（フロンティア / 訪問済み URL が収まらない）ため LONGTEXT
+    state = db.Column(db.Text().with_variant(mysql.LONGTEXT(), "mysql", "mariadb"), nullable=False)
+    pages_visited = db.Column(db.Integer, nullable=False, default=0)
+    companies_found = db.Column(db.Integer, nullable=False, default=0)
+    csv_path = db.Column(db.String(512))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from models import db
+
+class CompanyKey(db.Model):
+    # 重複候補を探すためのブロッキングキー（企業 1 件につき種類ごとに 1 行）
+    __tablename__ = "company_keys"
+    __table_args__ = (
+        db.UniqueConstraint("company_id", "kind", "value", name="uq_company_keys"),
+        db.Index("ix_company_keys_lookup", "kind", "value"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # phone / email_domain / domain / name
+    value = db.Column(db.String(255), nullable=False)
+
+
+class CompanyDuplicate(db.Model):
+    # company_id は canonical_id と同じ企業と判定された（送信・出力では canonical_id 側を使う）
+    __tablename__ = "company_duplicates"
+
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    canonical_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, index=True)
+    reason = db.Column(db.String(64), nullable=False, default="")  # 一致したキーの種類（カンマ区切り）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,33 @@
+from datetime import datetime
+from models import db
+
+class FrontierEntry(db.Model):
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (
+        db.UniqueConstraint("crawl_id", "url_key", name="uq_crawl_frontier_url"),
+        db.Index("ix_crawl_frontier_claim", "crawl_id", "status", "priority", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    crawl_id = db.Column(db.String(32), nullable=False)
+    url_key = db.Column(db.String(512), nullable=False)
+    url = db.Column(db.String(1024), nullable=False)
+    host = db.Column(db.String(255), nullable=False, default="")
+    kind = db.Column(db.String(16), nullable=False, default="listing")  # listing / company / sitemap
+    priority = db.Column(db.Integer, nullable=False, default=2)
+    status = db.Column(db.String(16), nullable=False, default="queued")  # queued / leased / done / failed / skipped
+    lease_owner = db.Column(db.String(128))
+    lease_expires = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Boolean, nullable=False, default=False)
+    result = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class HostLease(db.Model):
+    __tablename__ = "crawl_host_leases"
+
+    host = db.Column(db.String(255), primary_key=True)
+    owner = db.Column(db.String(128), nullable=False)
+    expires = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,47 @@
+import json
+from datetime import datetime
+from models import db
+
+class CrawlJob(db.Model):
+    __tablename__ = "crawl_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default="queued", index=True)
+    params = db.Column(db.Text)
+    pages_visited = db.Column(db.Integer, nullable=False, default=0)
+    companies_found = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    inserted = db.Column(db.Integer)
+    existed = db.Column(db.Integer)
+    csv_path = db.Column(db.String(512))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    owner = db.Column(db.String(128))  # キュー投入 / 実行したプロセス（ホスト名:pid）
+
+    def get_params(self):
+        return json.loads(self.params) if self.params else {}
+
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return 0
+        end = self.finished_at or datetime.utcnow()
+        return round((end - self.started_at).total_seconds(), 2)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "pages_visited": self.pages_visited,
+            "companies_found": self.companies_found,
+            "total": self.total,
+            "inserted": self.inserted,
+            "existed": self.existed,
+            "elapsed_seconds": self.elapsed_seconds(),
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"<CrawlJob {self.id} {self.status}>"
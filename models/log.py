@@ -0,0 +1,39 @@
+from datetime import datetime
+from models import db
+
+class FetchLog(db.Model):
+    __tablename__ = "fetch_logs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    crawl_id = db.Column(db.String(32), index=True)
+    url = db.Column(db.String(1024))
+    host = db.Column(db.String(255), index=True)
+    status = db.Column(db.Integer)
+    cache = db.Column(db.String(16))
+    bytes = db.Column(db.Integer, nullable=False, default=0)
+    dns_ms = db.Column(db.Float)
+    connect_ms = db.Column(db.Float)
+    total_ms = db.Column(db.Float)
+    decode_ms = db.Column(db.Float)
+    parse_ms = db.Column(db.Float)
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CrawlLog(db.Model):
+    __tablename__ = "crawl_logs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    crawl_id = db.Column(db.String(32), unique=True, index=True)
+    seed_url = db.Column(db.String(1024))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    companies = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    existed = db.Column(db.Integer, nullable=False, default=0)
+    fetches = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    bytes = db.Column(db.Integer, nullable=False, default=0)
+    by_domain = db.Column(db.Text)
@@ -0,0 +1,24 @@
+from models import db
+
+class DailyHostStat(db.Model):
+    __tablename__ = "daily_host_stats"
+    __table_args__ = (db.UniqueConstraint("day", "source_host", name="uq_daily_host_stats_day_host"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    source_host = db.Column(db.String(255), nullable=False, default="")
+    companies = db.Column(db.Integer, nullable=False, default=0)
+    with_email = db.Column(db.Integer, nullable=False, default=0)
+    with_phone = db.Column(db.Integer, nullable=False, default=0)
+    with_contact = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyCrawlStat(db.Model):
+    __tablename__ = "daily_crawl_stats"
+
+    day = db.Column(db.Date, primary_key=True)
+    runs = db.Column(db.Integer, nullable=False, default=0)
+    total_seconds = db.Column(db.Float, nullable=False, default=0)
+    max_seconds = db.Column(db.Float, nullable=False, default=0)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    companies = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,20 @@
+from datetime import datetime
+from models import db
+
+class Submission(db.Model):
+    __tablename__ = "submissions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"), unique=True, nullable=False)
+    # pending / sending / sent / failed / skipped / unknown（送信中に中断され、送信済みか判断できない）
+    status = db.Column(db.String(16), nullable=False, default="pending", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(255))
+    lease_owner = db.Column(db.String(128))
+    started_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Submission {self.company_id} {self.status}>"
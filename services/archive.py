@@ -0,0 +1,149 @@
+import base64, gzip, hashlib, json, os, threading, time, uuid
+from datetime import datetime
+
+from services import instrumentation
+from services.http_cache import cache_key
+
+# ======================================================
+# クロールの記録 / 再生（オフラインでの再現可能なベンチマーク用）
+#   ・記録: crawl_and_export(record=True) で、取得した全レスポンスを 1 クロール 1 ファイルに保存
+#       <CRAWL_ARCHIVE_DIR>/<crawl_id>.jsonl.gz（1 行 1 レコードの JSON、gzip 圧縮）
+#       WARC に倣ったレコード種別
+#         warcinfo   : クロールの条件（seed_url / limit など）
+#         response   : 静的取得の結果（本文はデコード済みテキスト。失敗 / HTML 以外も status / error を記録）
+#         conversion : ブラウザで描画し直した HTML
+#         resource   : sitemap から読み取った (種類, URL) の一覧（sitemap の本文そのものは保存しない）
+#         metadata   : クロールの抽出結果（再生時の比較用）
+#       再開したクロールは同じファイルに gzip メンバーを追記する
+#   ・再生: crawl_and_export(replay=<path>) で、_fetch をネットワークに出さずに記録から返す
+#       latency: None（待たない）/ 秒数 / "recorded"（記録時の所要時間だけ待つ）
+# ======================================================
+
+ARCHIVE_DIR = os.getenv("CRAWL_ARCHIVE_DIR", os.path.join(os.getcwd(), "instance", "crawl_archive"))
+SOFTWARE = "construction_scraper"
+
+
+def archive_path(crawl_id):
+    return os.path.join(ARCHIVE_DIR, f"{crawl_id}.jsonl.gz")
+
+
+def _digest(text):
+    return "sha1:" + base64.b32encode(hashlib.sha1(text.encode("utf-8")).digest()).decode("ascii")
+
+
+def _now():
+    return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+
+class ArchiveWriter:
+    def __init__(self, path, info=None):
+        self.path = path
+        self.records = 0
+        self._lock = threading.Lock()
+        self._f = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write({"warc_type": "warcinfo", "software": SOFTWARE, **(info or {})})
+
+    def _write(self, record):
+        record = {"record_id": f"urn:uuid:{uuid.uuid4()}", "date": _now(), **record}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._f is None:
+                # 閉じた後の追記は新しい gzip メンバーとして書く
+                self._f = gzip.open(self.path, "at", encoding="utf-8")
+            self._f.write(line)
+            self.records += 1
+
+    def response(self, url, text, status=None, error=None, content_type=None, encoding=None, elapsed=None):
+        self._write({
+            "warc_type": "response",
+            "target_uri": url,
+            "status": status,
+            "error": error,
+            "content_type": content_type,
+            "encoding": encoding,
+            "elapsed_ms": round(elapsed * 1000, 1) if elapsed is not None else None,
+            "length": len(text.encode("utf-8")) if text else 0,
+            "payload_digest": _digest(text) if text else None,
+            "text": text,
+        })
+
+    def conversion(self, url, text):
+        self._write({"warc_type": "conversion", "target_uri": url, "payload_digest": _digest(text), "text": text})
+
+    def sitemap(self, url, entries):
+        self._write({"warc_type": "resource", "target_uri": url, "entries": entries})
+
+    def metadata(self, rows, stats=None):
+        self._write({"warc_type": "metadata", "rows": rows, "stats": stats or {}})
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+class ArchiveReader:
+    def __init__(self, path, latency=None):
+        self.path = path
+        self.latency = latency
+        self.info = {}
+        self.rows = None
+        self._responses = {}
+        self._conversions = {}
+        self._sitemaps = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    self._add(json.loads(line))
+            except (EOFError, ValueError):
+                # 強制終了で末尾が書きかけの場合は、読めたところまでを使う
+                pass
+
+    def _add(self, r):
+        kind = r.get("warc_type")
+        if kind == "warcinfo":
+            self.info = self.info or r
+        elif kind == "response":
+            self._responses[cache_key(r["target_uri"])] = r
+        elif kind == "conversion":
+            self._conversions[cache_key(r["target_uri"])] = r["text"]
+        elif kind == "resource":
+            self._sitemaps[cache_key(r["target_uri"])] = [tuple(e) for e in r.get("entries") or []]
+        elif kind == "metadata":
+            self.rows = r.get("rows")
+
+    def __len__(self):
+        return len(self._responses)
+
+    def fetch(self, url):
+        # _fetch の代わり。記録に無い URL は取得失敗として扱う
+        rec = instrumentation.start_fetch(url)
+        r = self._responses.get(cache_key(url))
+        if r is None:
+            instrumentation.end_fetch(rec, error="not-archived")
+            return None
+        if self.latency == "recorded":
+            time.sleep((r.get("elapsed_ms") or 0) / 1000)
+        elif self.latency:
+            time.sleep(float(self.latency))
+        instrumentation.end_fetch(rec, r.get("status"), r.get("length") or 0, cache="replay", error=r.get("error"))
+        return r.get("text")
+
+    def rendered(self, url):
+        return self._conversions.get(cache_key(url))
+
+    def sitemap(self, url):
+        # 記録に無い sitemap は空として扱う
+        rec = instrumentation.start_fetch(url)
+        entries = self._sitemaps.get(cache_key(url))
+        instrumentation.end_fetch(rec, 200 if entries is not None else None, 0, cache="replay",
+                                  error=None if entries is not None else "not-archived")
+        return entries or []
+
+
+def current():
+    # 実行中のクロール（スレッドに紐づく CrawlRecorder）の記録 / 再生先
+    recorder = instrumentation.current()
+    return recorder.archive if recorder else None
@@ -0,0 +1,66 @@
+import json, os
+from datetime import datetime
+from sqlalchemy import text
+
+from models import db
+from models.checkpoint import CrawlCheckpoint
+
+# ======================================================
+# クロールのチェックポイント
+#   ・フロンティア / 訪問済み URL / 抽出済み企業HP / 抽出結果 / 件数を crawl_checkpoints に定期保存
+#   ・保存はページ処理の区切り（一覧ページ 1 件の処理が終わった時点）でのみ行う
+#   ・ジョブが落ちても同じ crawl_id で再開でき、保存済みのページは再取得しない
+#   ・正常終了したらチェックポイントは削除
+#   ・state は MySQL では LONGTEXT（旧定義の TEXT で作成済みのテーブルは init-db で広げる）
+# ======================================================
+
+CHECKPOINT_INTERVAL = float(os.getenv("CRAWL_CHECKPOINT_INTERVAL", "10"))
+
+
+def save_checkpoint(crawl_id, state):
+    try:
+        cp = db.session.get(CrawlCheckpoint, crawl_id) or CrawlCheckpoint(crawl_id=crawl_id)
+        cp.state = json.dumps(state, ensure_ascii=False)
+        cp.pages_visited = len(state.get("visited", []))
+        cp.companies_found = len(state.get("rows", []))
+        cp.csv_path = state.get("csv_path")
+        cp.updated_at = datetime.utcnow()
+        db.session.add(cp)
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"Checkpoint Error: {e}")
+        return False
+
+
+def ensure_state_column():
+    # TEXT（64KB まで）で作成済みの crawl_checkpoints.state を LONGTEXT に変更する
+    if db.engine.dialect.name not in ("mysql", "mariadb"):
+        return
+    with db.engine.begin() as conn:
+        data_type = conn.execute(text(
+            "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'crawl_checkpoints' AND COLUMN_NAME = 'state'"
+        )).scalar()
+        if data_type and data_type.lower() != "longtext":
+            conn.execute(text("ALTER TABLE crawl_checkpoints MODIFY state LONGTEXT NOT NULL"))
+
+
+def load_checkpoint(crawl_id):
+    cp = db.session.get(CrawlCheckpoint, crawl_id)
+    return json.loads(cp.state) if cp else None
+
+
+def checkpoint_csv_path(crawl_id):
+    cp = db.session.get(CrawlCheckpoint, crawl_id)
+    return cp.csv_path if cp else None
+
+
+def delete_checkpoint(crawl_id):
+    try:
+        db.session.query(CrawlCheckpoint).filter_by(crawl_id=crawl_id).delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Checkpoint Error: {e}")
@@ -0,0 +1,146 @@
+import threading, time
+from sqlalchemy import text, or_
+
+from models import db
+from models.company import Company
+
+# ======================================================
+# 企業一覧の検索・件数
+#   ・SQLite : FTS5 (trigram) の外部コンテンツテーブル companies_fts（トリガーで同期）
+#   ・MySQL  : ngram パーサーの FULLTEXT インデックス ft_companies_search
+#   ・インデックスが無い / 検索語がトークン長より短い場合は LIKE 検索にフォールバック
+#   ・総件数は毎回 COUNT(*) せず、TTL 付きでキャッシュした概算値を使う
+# ======================================================
+
+SEARCH_COLUMNS = ("company_name", "company_site", "phone", "email")
+FTS_TABLE = "companies_fts"
+MYSQL_INDEX = "ft_companies_search"
+MIN_TRIGRAM = 3
+MIN_NGRAM = 2
+COUNT_TTL = 60
+COUNT_CAP = 10000
+
+_index_available = None
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def ensure_search_index():
+    global _index_available
+    dialect = db.engine.dialect.name
+    cols = ", ".join(SEARCH_COLUMNS)
+    with db.engine.begin() as conn:
+        if dialect == "sqlite":
+            new_cols = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+            old_cols = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}
+            ).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{cols}, content='companies', content_rowid='id', tokenize='trigram')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON companies BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON companies BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON companies BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            if not exists:
+                # 既存行をインデックスに取り込む
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        elif dialect in ("mysql", "mariadb"):
+            exists = conn.execute(text(
+                "SELECT 1 FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'companies' AND INDEX_NAME = :n"
+            ), {"n": MYSQL_INDEX}).first()
+            if not exists:
+                conn.execute(text(f"ALTER TABLE companies ADD FULLTEXT INDEX {MYSQL_INDEX} ({cols}) WITH PARSER ngram"))
+    _index_available = None
+
+
+def _has_index():
+    global _index_available
+    if _index_available is None:
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == "sqlite":
+                row = db.session.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :n"), {"n": FTS_TABLE}
+                ).first()
+            elif dialect in ("mysql", "mariadb"):
+                row = db.session.execute(text(
+                    "SELECT 1 FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'companies' AND INDEX_NAME = :n"
+                ), {"n": MYSQL_INDEX}).first()
+            else:
+                row = None
+            _index_available = row is not None
+        except Exception:
+            _index_available = False
+    return _index_available
+
+
+def filter_search(query, term):
+    term = term.strip()
+    if not term:
+        return query
+
+    dialect = db.engine.dialect.name
+    if _has_index():
+        if dialect == "sqlite" and len(term) >= MIN_TRIGRAM:
+            phrase = '"' + term.replace('"', '""') + '"'
+            return query.filter(Company.id.in_(
+                text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q")
+                .bindparams(q=phrase).columns(db.column("rowid", db.Integer))
+            ))
+        if dialect in ("mysql", "mariadb") and len(term) >= MIN_NGRAM:
+            phrase = '"' + term.replace('"', " ") + '"'
+            return query.filter(text(
+                f"MATCH ({', '.join(SEARCH_COLUMNS)}) AGAINST (:q IN BOOLEAN MODE)"
+            ).bindparams(q=phrase))
+
+    like = f"%{term}%"
+    return query.filter(or_(*(getattr(Company, c).like(like) for c in SEARCH_COLUMNS)))
+
+
+def approximate_count(term=""):
+    # (件数, 上限到達フラグ) を返す
+    key = term.strip()
+    now = time.time()
+    with _count_lock:
+        hit = _count_cache.get(key)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    if not key:
+        result = (_table_rows(), False)
+    else:
+        sub = filter_search(db.session.query(Company.id), key).limit(COUNT_CAP + 1).subquery()
+        n = db.session.query(db.func.count()).select_from(sub).scalar() or 0
+        result = (min(n, COUNT_CAP), n > COUNT_CAP)
+
+    with _count_lock:
+        _count_cache[key] = (now + COUNT_TTL, result)
+        if len(_count_cache) > 1000:
+            _count_cache.clear()
+    return result
+
+
+def _table_rows():
+    if db.engine.dialect.name in ("mysql", "mariadb"):
+        # InnoDB の統計値（概算）。COUNT(*) のフルスキャンを避ける
+        n = db.session.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'companies'"
+        )).scalar()
+        if n is not None:
+            return int(n)
+    return db.session.query(db.func.count(Company.id)).scalar() or 0
@@ -0,0 +1,157 @@
+import os
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db
+from models.company import Company
+from services.frontier import canonicalize
+from services.metrics import record_companies
+
+# ======================================================
+# 企業データの一括保存
+#   ・抽出結果をバッファし、batch_size 件ごとにまとめて保存
+#   ・既存サイトは 1 回の IN 検索でまとめて判定
+#   ・新規分は INSERT ... ON CONFLICT DO NOTHING / INSERT IGNORE で一括挿入
+#     （同時に別のクロールが同じサイトを保存しても unique 制約で重複しない）
+#   ・保存後、新規 / 更新した企業の重複判定（services/dedup）を行う
+# ======================================================
+
+BATCH_SIZE = int(os.getenv("COMPANY_BATCH_SIZE", "100"))
+
+
+def insert_ignore(model, rows, keys):
+    # unique 制約に当たる行は無視する一括 INSERT（挿入件数は rowcount）
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table).values(rows).on_conflict_do_nothing(index_elements=keys)
+    if dialect in ("mysql", "mariadb"):
+        return mysql.insert(table).values(rows).prefix_with("IGNORE")
+    if dialect == "postgresql":
+        return postgresql.insert(table).values(rows).on_conflict_do_nothing(index_elements=keys)
+    return insert(table).values(rows)
+
+
+def _insert_ignore(rows):
+    return insert_ignore(Company, rows, ["company_site"])
+
+
+def db_now():
+    # DB の現在時刻（companies.created_at の server_default と同じ時計。アプリ側の UTC とは TZ が違う）
+    return db.session.scalar(select(func.now()))
+
+
+def load_known_sites(created_before=None):
+    # company_site 列だけを読み込み、正規化キーの集合にする（http/https・www 違いも既知扱い）
+    # created_before: 再開時、中断したクロール自身が保存した企業を「既知」に含めないため（db_now() の値）
+    query = db.session.query(Company.company_site)
+    if created_before is not None:
+        query = query.filter(Company.created_at < created_before)
+    return {canonicalize(site) for (site,) in query if site}
+
+
+def company_row(info):
+    site = info.get("homepage_url") or info.get("source_url")
+    if not site:
+        return None
+    return {
+        "company_name": info.get("company_name") or "",
+        "company_site": site,
+        "inquiry_url": info.get("contact_url") or "",
+        "email": info.get("email") or "",
+        "phone": info.get("phone") or "",
+    }
+
+
+class CompanyWriter:
+    def __init__(self, batch_size=None, update_existing=False, source_host=""):
+        self.batch_size = max(1, int(batch_size or BATCH_SIZE))
+        self.update_existing = update_existing
+        self.source_host = source_host
+        self.inserted = 0
+        self.existed = 0
+        self.updated = 0
+        self.failed = 0
+        self.duplicates = 0
+        self._buffer = {}
+
+    def add(self, info):
+        row = company_row(info)
+        if not row:
+            return
+        site = row["company_site"]
+        if site in self._buffer:
+            self.existed += 1
+            return
+        self._buffer[site] = row
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows = self._buffer
+        self._buffer = {}
+        try:
+            existing = dict(
+                db.session.query(Company.company_site, Company.id)
+                .filter(Company.company_site.in_(list(rows)))
+            )
+            new_rows = [r for site, r in rows.items() if site not in existing]
+            inserted = 0
+            if new_rows:
+                result = db.session.execute(_insert_ignore(new_rows))
+                inserted = max(result.rowcount, 0)
+                # グラフ用集計も同じトランザクションで加算（別プロセスと競合した場合は概算）
+                record_companies(new_rows[:inserted], self.source_host)
+            updated = 0
+            if self.update_existing and existing:
+                # 再取得時は空でない項目のみ上書きする
+                changes = []
+                for site, company_id in existing.items():
+                    values = {k: v for k, v in rows[site].items() if v and k != "company_site"}
+                    if values:
+                        changes.append({"id": company_id, **values})
+                if changes:
+                    db.session.execute(update(Company), changes)
+                    updated = len(changes)
+            db.session.commit()
+            self.inserted += inserted
+            self.existed += len(rows) - inserted
+            self.updated += updated
+            print(f"Saved to DB: {inserted} / Already Exists: {len(rows) - inserted} / Updated: {updated}")
+        except Exception as e:
+            db.session.rollback()
+            self.failed += len(rows)
+            print(f"DB Error for {len(rows)} rows: {e}")
+            return
+        sites = [r["company_site"] for r in new_rows] + (list(existing) if updated else [])
+        if sites:
+            self._index(sites)
+
+    def _index(self, sites):
+        # 重複判定は企業の保存とは別のトランザクション（失敗しても保存済みの企業はそのまま、dedup-companies で作り直せる）
+        from services.dedup import DEDUP_ENABLED, index_companies
+
+        if not DEDUP_ENABLED:
+            return
+        try:
+            ids = [cid for (cid,) in db.session.query(Company.id).filter(Company.company_site.in_(sites))]
+            self.duplicates += index_companies(ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Dedup Error for {len(sites)} rows: {e}")
+
+    def counts(self):
+        return {"inserted": self.inserted, "existed": self.existed, "updated": self.updated, "failed": self.failed,
+                "duplicates": self.duplicates}
+
+    def restore(self, counts):
+        # チェックポイントから再開する場合の件数の引き継ぎ
+        for k in ("inserted", "existed", "updated", "failed", "duplicates"):
+            setattr(self, k, counts.get(k, 0))
+
+    def close(self):
+        self.flush()
+        return self.counts()
@@ -1,96 +1,199 @@
-import csv, time, os
-from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-
-_stats = {}
-
-def crawl_and_export(seed_url, allowed_domain=None, limit=100, max_pages=100, jp_keywords=None):
-
-    start = time.time()
-
-    options = Options()
-    options.add_argument("--headless=new")
-    driver = webdriver.Chrome(ChromeDriverManager().install(), options=options)
-
-    visited = set()
-    queue = [seed_url]
-    results = []
-
-    filename = f"companies_{time.strftime('%Y%m%d_%H%M%S')}.csv"
-    csv_path = os.path.join(os.getcwd(), "downloads", filename)
-    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-
-    if jp_keywords:
-        keywords = [k.strip() for k in jp_keywords.split(",") if k.strip()]
-    else:
-        keywords = []
-
-    while queue and len(results) < limit and len(visited) < max_pages:
-        url = queue.pop(0)
-        if url in visited:
-            continue
-
-        visited.add(url)
-
+import asyncio, atexit, os, re, threading, time
+
+from services import instrumentation
+
+# ======================================================
+# 静的取得 / ブラウザ描画のハイブリッド
+#   ・まず通常の HTTP で取得し、JS で中身を組み立てるページ（JS シェル）と判定した場合のみブラウザで描画
+#   ・ブラウザ（Playwright / Chromium）はプロセス内で 1 つだけ起動し、ブラウザコンテキストを使い回す
+#     （クロールのたびに Chrome を起動しない）
+#   ・描画は専用スレッドのイベントループで実行し、複数ページを並列に開く
+#   ・固定の sleep ではなく networkidle（通信が落ち着くまで）を上限付きで待つ
+#   ・画像 / フォント / 動画は読み込まない
+#   ・Playwright が未インストール / ブラウザ未導入の場合は静的 HTML をそのまま使う
+# ======================================================
+
+RENDER_MODE = os.getenv("CRAWL_RENDER_JS", "auto")  # auto / off
+BROWSER_CONTEXTS = int(os.getenv("CRAWL_BROWSER_CONTEXTS", "2"))
+BROWSER_PAGES = int(os.getenv("CRAWL_BROWSER_PAGES", "4"))
+CONTEXT_MAX_PAGES = int(os.getenv("CRAWL_BROWSER_CONTEXT_PAGES", "200"))
+RENDER_TIMEOUT = float(os.getenv("CRAWL_RENDER_TIMEOUT", "15"))
+NETWORK_IDLE_TIMEOUT = float(os.getenv("CRAWL_NETWORK_IDLE_TIMEOUT", "5"))
+BLOCKED_RESOURCES = {"image", "font", "media"}
+USER_AGENT = "Mozilla/5.0"
+
+# JS シェル判定（本文がこれ未満で、SPA のマウント先がある / ほぼ script だけのページ）
+MIN_TEXT_CHARS = 200
+EMPTY_TEXT_CHARS = 50
+_SHELL_MARKERS = re.compile(
+    r"<div[^>]+id=[\"'](root|app|__next|__nuxt|___gatsby)[\"'][^>]*>\s*</div>"
+    r"|<noscript[^>]*>[^<]*(javascript|JavaScript)[^<]*</noscript>"
+    r"|<app-root[^>]*>\s*</app-root>",
+    re.I,
+)
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script>|<style\b[^>]*>.*?</style>", re.I | re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def needs_browser(html):
+    if not html:
+        return False
+    body = _SCRIPT_RE.sub(" ", html)
+    text = _SPACE_RE.sub(" ", _TAG_RE.sub(" ", body)).strip()
+    if len(text) >= MIN_TEXT_CHARS:
+        return False
+    if _SHELL_MARKERS.search(html):
+        return True
+    return len(text) < EMPTY_TEXT_CHARS and "<script" in html.lower()
+
+
+class BrowserPool:
+    def __init__(self, contexts=BROWSER_CONTEXTS, pages=BROWSER_PAGES):
+        self.contexts = max(1, contexts)
+        self.pages = max(1, pages)
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._free = None
+        self._slots = None
+        self._start_lock = None
+        self.available = True
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="browser", daemon=True)
+                self._thread.start()
+
+    async def _start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            # ブラウザが落ちていた場合も含めて起動し直す
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._free = asyncio.Queue()
+            for _ in range(self.contexts):
+                await self._free.put([await self._new_context(), 0])
+            self._slots = asyncio.Semaphore(self.pages)
+
+    async def _new_context(self):
+        ctx = await self._browser.new_context(user_agent=USER_AGENT)
+        await ctx.route("**/*", _block_heavy)
+        return ctx
+
+    async def _render(self, url):
+        await self._start()
+        async with self._slots:
+            slot = await self._free.get()
+            page = None
+            try:
+                page = await slot[0].new_page()
+                await page.goto(url, wait_until="domcontentloaded", timeout=RENDER_TIMEOUT * 1000)
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=NETWORK_IDLE_TIMEOUT * 1000)
+                except Exception:
+                    # 常時通信するページ（解析タグ / ポーリング）は待ち切らずにその時点の DOM を使う
+                    pass
+                return await page.content()
+            finally:
+                if page is not None:
+                    await page.close()
+                slot[1] += 1
+                if slot[1] >= CONTEXT_MAX_PAGES and self._browser.is_connected():
+                    # 長時間使い続けたコンテキストは作り直す（メモリ / Cookie の蓄積を防ぐ）
+                    await slot[0].close()
+                    slot = [await self._new_context(), 0]
+                # ブラウザが再起動された場合、古いコンテキストは戻さない
+                if slot[0].browser is self._browser:
+                    await self._free.put(slot)
+
+    def render(self, url, timeout=None):
+        if not self.available:
+            return None
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._render(url), self._loop)
         try:
-            driver.get(url)
-            time.sleep(1)
-        except:
-            continue
-
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-
-        text = soup.get_text(" ", strip=True)
-
-        # ★ キーワード一致判定
-        if not keywords or any(k in text for k in keywords):
-            title = soup.title.string if soup.title else "不明"
-            email = _find_email(text)
-            phone = _find_phone(text)
-            results.append([title, url, email, phone])
-
-        # ★ リンク取得
-        for a in soup.find_all("a", href=True):
-            next_url = urljoin(url, a["href"])
-            parsed = urlparse(next_url)
-
-            # allowed_domain があれば制限
-            if allowed_domain:
-                if allowed_domain.replace("www.","") not in parsed.netloc.replace("www.",""):
-                    continue
+            return future.result(timeout=timeout or RENDER_TIMEOUT + NETWORK_IDLE_TIMEOUT + 5)
+        except ImportError:
+            print("Playwright is not installed; JS rendering disabled")
+            self.available = False
+        except Exception as e:
+            future.cancel()
+            if "Executable doesn't exist" in str(e):
+                print("Chromium is not installed (playwright install chromium); JS rendering disabled")
+                self.available = False
             else:
-                # なければ seed と同じドメインのみ
-                if urlparse(seed_url).netloc.replace("www.","") not in parsed.netloc.replace("www.",""):
-                    continue
+                print(f"Render Error: {url} {e}")
+        return None
+
+    async def _stop(self):
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result(timeout=10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+        self._browser = None
+        self._playwright = None
+
+
+async def _block_heavy(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
 
-            queue.append(next_url)
 
-    driver.quit()
+_pool = None
+_pool_lock = threading.Lock()
 
-    # CSV 書き込み
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["company_name", "url", "email", "phone"])
-        writer.writerows(results)
 
-    _stats["total"] = len(results)
-    _stats["by_domain"] = {urlparse(seed_url).netloc: len(results)}
-    _stats["duration_seconds"] = round(time.time() - start, 2)
-    _stats["last_file"] = csv_path
+def get_browser_pool():
+    global _pool
+    if RENDER_MODE == "off":
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
 
-    return csv_path
 
+def render_if_needed(url, html):
+    # 静的 HTML が JS シェルの場合のみブラウザで描画し直す（描画できなければ静的 HTML を返す）
+    if not needs_browser(html):
+        return html
+    pool = get_browser_pool()
+    if pool is None or not pool.available:
+        return html
+    t0 = time.perf_counter()
+    rendered = pool.render(url)
+    instrumentation.REGISTRY.observe_stage("render", time.perf_counter() - t0)
+    return rendered or html
 
-def _find_email(text):
-    import re
-    res = re.findall(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text)
-    return res[0] if res else ""
 
+def crawl_and_export(*args, **kwargs):
+    # 旧 Selenium 版の入口。描画の要否は scraper 側で判定する
+    from services.scraper import crawl_and_export as run
 
-def _find_phone(text):
-    import re
-    res = re.findall(r"\d{2,4}-\d{2,4}-\d{3,4}", text)
-    return res[0] if res else ""
+    return run(*args, **kwargs)
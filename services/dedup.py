@@ -0,0 +1,296 @@
+import os, re, unicodedata
+from collections import defaultdict
+from urllib.parse import urlsplit
+from sqlalchemy import select
+
+from models import db
+from models.company import Company
+from models.dedup import CompanyDuplicate, CompanyKey
+from services.company_store import insert_ignore
+
+# ======================================================
+# 企業データの重複（同一企業の別レコード）検出
+#   ・company_site の完全一致だけでは http / https・www 違い、採用サイトなど別ドメインの同一企業を排除できない
+#   ・全件同士の比較はせず、ブロッキングキーが一致する企業だけを候補にする
+#       phone        : 数字のみ（+81 → 0）
+#       email_domain : メールアドレスのドメイン（フリーメール / プロバイダは除外）
+#       domain       : 企業HPの登録ドメイン（co.jp などは 3 ラベル。レンタルサーバー / 無料ホスティングは
+#                      利用者ごとのホスト名、sites.google.com などパスで分かれるサービスはパスまで含める）
+#       name         : NFKC 正規化（全角 / 半角）し、株式会社 などの法人格・記号・空白を除いた企業名
+#   ・判定: キーが 2 種類以上一致 → 重複（登録ドメインだけの一致では重複にしない。
+#     共有ホスティングの一覧に無いサービスでは、別の企業でも登録ドメインが同じになるため）
+#   ・一致したキーの企業が多すぎる値（代表番号の使い回し / ダミー値など）は候補にしない
+#   ・重複と判定した企業は company_duplicates に元の企業（canonical_id）と共に記録し、削除はしない
+#   ・保存時（CompanyWriter）に新規分だけ判定し、既存データは flask dedup-companies でまとめて作り直す
+# ======================================================
+
+DEDUP_ENABLED = os.getenv("COMPANY_DEDUP", "1") == "1"
+KEY_WEIGHTS = {"domain": 2, "phone": 2, "email_domain": 2, "name": 2}
+MATCH_SCORE = 3
+MAX_BLOCK = int(os.getenv("COMPANY_DEDUP_MAX_BLOCK", "50"))
+CHUNK = 500
+
+_CORP_RE = re.compile(
+    r"株式会社|有限会社|合同会社|合資会社|合名会社|(一般|公益)?(社団|財団)法人|社会福祉法人|医療法人|"
+    r"特定非営利活動法人|npo法人|\((株|有|合|資|名)\)|"
+    r"(?<![a-z])(co\.?,?\s*ltd|inc|corp(oration)?|company|k\.?k|llc)(?![a-z])\.?",
+    re.I,
+)
+_TITLE_SEP_RE = re.compile(r"[|｜【]| [-–—] ")
+_NAME_STRIP_RE = re.compile(r"[\W_]+")
+
+_SECOND_LEVEL = {"co", "or", "ne", "ac", "go", "gr", "ed", "lg", "ad", "com", "net", "org", "gov", "edu"}
+# サブドメインごとに別の利用者になるレンタルサーバー / ホスティング（登録ドメインでまとめない）
+_SHARED_HOSTS = {
+    "jimdofree.com", "jimdo.com", "jimdosite.com", "wixsite.com", "fc2.com", "web.fc2.com", "wordpress.com",
+    "blogspot.com", "goo.ne.jp", "hatenablog.com", "hatenablog.jp", "webnode.jp", "crayonsite.net", "crayonsite.com",
+    "studio.site", "peraichi.com", "shopinfo.jp", "localinfo.jp", "business.site", "github.io", "amebaownd.com",
+    "sakura.ne.jp", "xsrv.jp", "lolipop.jp", "boy.jp", "chicappa.jp", "daa.jp", "main.jp", "sub.jp", "heteml.net",
+    "coreserver.jp", "xrea.com", "xdomain.jp", "wpx.jp", "cloudfree.jp", "gmobb.jp", "weebly.com",
+    "mystrikingly.com", "square.site", "goope.jp", "seesaa.net", "exblog.jp", "cocolog-nifty.com", "livedoor.blog",
+    "netlify.app", "vercel.app", "web.app", "firebaseapp.com", "herokuapp.com", "thebase.in", "stores.jp",
+}
+# パスごとに別の利用者になるサービス（ホスト名, 利用者を表すパスの階層数）
+_PATH_HOSTS = {
+    "sites.google.com": 2, "ameblo.jp": 1, "note.com": 1, "blog.livedoor.jp": 1, "plaza.rakuten.co.jp": 1,
+    "facebook.com": 1, "instagram.com": 1, "twitter.com": 1, "x.com": 1, "tiktok.com": 1, "youtube.com": 1,
+}
+_FREE_MAIL = {
+    "gmail.com", "googlemail.com", "yahoo.co.jp", "ymail.ne.jp", "yahoo.com", "hotmail.com", "hotmail.co.jp",
+    "outlook.com", "outlook.jp", "live.jp", "icloud.com", "me.com", "mac.com", "aol.com",
+    "docomo.ne.jp", "ezweb.ne.jp", "au.com", "softbank.ne.jp", "i.softbank.jp",
+    "nifty.com", "biglobe.ne.jp", "ocn.ne.jp", "so-net.ne.jp", "plala.or.jp", "dion.ne.jp", "odn.ne.jp",
+    "infoweb.ne.jp", "mbr.nifty.com", "jcom.home.ne.jp", "zaq.ne.jp", "eonet.ne.jp", "bb.excite.co.jp",
+}
+
+
+# ------------------------------------------------------
+# ブロッキングキー
+# ------------------------------------------------------
+
+def normalize_name(name):
+    if not name:
+        return ""
+    s = unicodedata.normalize("NFKC", name).lower()
+    # ページタイトル由来の「企業名 | サイト説明」は先頭だけを使う
+    s = _TITLE_SEP_RE.split(s, 1)[0]
+    s = _CORP_RE.sub("", s)
+    s = _NAME_STRIP_RE.sub("", s)
+    return s if len(s) >= 2 else ""
+
+
+def normalize_phone(phone):
+    if not phone:
+        return ""
+    digits = re.sub(r"\D", "", unicodedata.normalize("NFKC", phone))
+    if digits.startswith("81") and len(digits) in (11, 12):
+        digits = "0" + digits[2:]
+    if not digits.startswith("0") or len(digits) not in (10, 11):
+        return ""
+    # 03-0000-0000 のようなダミー番号
+    if len(set(digits[2:])) <= 1:
+        return ""
+    return digits
+
+
+def registrable_domain(host):
+    host = (host or "").lower().strip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    labels = host.split(".")
+    if len(labels) < 2 or host.replace(".", "").isdigit():
+        return ""
+    for i in range(len(labels) - 1):
+        if ".".join(labels[i:]) in _SHARED_HOSTS:
+            # 利用者のサブドメインが無い（サービス自体のホスト）場合は、企業を表さないのでキーにしない
+            return ".".join(labels[i - 1:]) if i else ""
+    n = 3 if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL else 2
+    return ".".join(labels[-n:])
+
+
+def site_domain(url):
+    if not url:
+        return ""
+    parts = urlsplit(url if "//" in url else "//" + url)
+    host = (parts.hostname or "").removeprefix("www.")
+    depth = _PATH_HOSTS.get(host)
+    if depth:
+        segments = [s for s in parts.path.lower().split("/") if s][:depth]
+        return "/".join([host] + segments) if len(segments) == depth else ""
+    return registrable_domain(parts.hostname)
+
+
+def email_domain(email):
+    if not email or "@" not in email:
+        return ""
+    domain = email.rsplit("@", 1)[1].strip().lower()
+    if domain in _FREE_MAIL or any(domain.endswith("." + d) for d in _FREE_MAIL):
+        return ""
+    return registrable_domain(domain)
+
+
+def blocking_keys(company_name, company_site, email, phone):
+    keys = [
+        ("domain", site_domain(company_site)),
+        ("phone", normalize_phone(phone)),
+        ("email_domain", email_domain(email)),
+        ("name", normalize_name(company_name)),
+    ]
+    return [(kind, value[:255]) for kind, value in keys if value]
+
+
+def _score(kinds):
+    return sum(KEY_WEIGHTS[k] for k in kinds)
+
+
+# ------------------------------------------------------
+# 保存時の判定
+# ------------------------------------------------------
+
+def index_companies(company_ids):
+    # 指定した企業のキーを登録し、既存の企業と重複していれば company_duplicates に記録する
+    # 戻り値: 新たに重複と判定した件数（commit は呼び出し元）
+    company_ids = sorted(set(company_ids))
+    if not company_ids:
+        return 0
+    rows = db.session.execute(
+        select(Company.id, Company.company_name, Company.company_site, Company.email, Company.phone)
+        .where(Company.id.in_(company_ids))
+    ).all()
+    keys = {r.id: blocking_keys(r.company_name, r.company_site, r.email, r.phone) for r in rows}
+
+    # 更新された企業はキーを作り直す
+    db.session.query(CompanyKey).filter(CompanyKey.company_id.in_(company_ids)).delete(synchronize_session=False)
+    key_rows = [{"company_id": cid, "kind": k, "value": v} for cid, ks in keys.items() for k, v in ks]
+    for i in range(0, len(key_rows), CHUNK):
+        db.session.execute(insert_ignore(CompanyKey, key_rows[i:i + CHUNK], ["company_id", "kind", "value"]))
+
+    blocks = _lookup({kv for ks in keys.values() for kv in ks})
+    flagged = dict(
+        db.session.query(CompanyDuplicate.company_id, CompanyDuplicate.canonical_id)
+        .filter(CompanyDuplicate.company_id.in_(
+            list({c for ids in blocks.values() if len(ids) <= MAX_BLOCK for c in ids})
+        ))
+    )
+
+    dup_rows = []
+    for cid in company_ids:
+        if cid in flagged:
+            continue
+        shared = defaultdict(set)
+        for kv in keys.get(cid, ()):
+            ids = blocks.get(kv, ())
+            if len(ids) > MAX_BLOCK:
+                continue
+            for other in ids:
+                # 先に登録された企業を正とする
+                if other < cid:
+                    shared[other].add(kv[0])
+        matches = [(-_score(kinds), flagged.get(other, other), kinds) for other, kinds in shared.items()
+                   if _score(kinds) >= MATCH_SCORE]
+        if not matches:
+            continue
+        _, canonical, kinds = min(matches, key=lambda m: (m[0], m[1]))
+        flagged[cid] = canonical
+        dup_rows.append({"company_id": cid, "canonical_id": canonical, "reason": ",".join(sorted(kinds))})
+
+    if not dup_rows:
+        return 0
+    return max(db.session.execute(insert_ignore(CompanyDuplicate, dup_rows, ["company_id"])).rowcount, 0)
+
+
+def _lookup(kvs):
+    # (kind, value) ごとに、そのキーを持つ企業 ID を返す（種類ごとに IN 検索）
+    by_kind = defaultdict(list)
+    for kind, value in kvs:
+        by_kind[kind].append(value)
+    blocks = defaultdict(list)
+    for kind, values in by_kind.items():
+        for i in range(0, len(values), CHUNK):
+            for cid, value in db.session.execute(
+                select(CompanyKey.company_id, CompanyKey.value)
+                .where(CompanyKey.kind == kind, CompanyKey.value.in_(values[i:i + CHUNK]))
+            ):
+                blocks[(kind, value)].append(cid)
+    return blocks
+
+
+# ------------------------------------------------------
+# 既存データの一括クラスタリング
+# ------------------------------------------------------
+
+def rebuild(batch_size=1000):
+    # company_keys / company_duplicates を全件から作り直す
+    # 1 回の走査でキーを集め、同じキーを持つ企業同士（ブロック内）だけを比較する
+    db.session.query(CompanyDuplicate).delete()
+    db.session.query(CompanyKey).delete()
+    db.session.commit()
+
+    blocks = defaultdict(list)
+    companies = 0
+    last_id = 0
+    while True:
+        # id 順に batch_size 件ずつ読み切ってから書き込む
+        # （結果を読みながら同じ接続で INSERT すると、MySQL では読み残した結果が捨てられる）
+        rows = db.session.execute(
+            select(Company.id, Company.company_name, Company.company_site, Company.email, Company.phone)
+            .where(Company.id > last_id)
+            .order_by(Company.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        companies += len(rows)
+        pending = []
+        for r in rows:
+            for kind, value in blocking_keys(r.company_name, r.company_site, r.email, r.phone):
+                blocks[(kind, value)].append(r.id)
+                pending.append({"company_id": r.id, "kind": kind, "value": value})
+        if pending:
+            db.session.execute(insert_ignore(CompanyKey, pending, ["company_id", "kind", "value"]))
+
+    shared = defaultdict(set)
+    for (kind, _), ids in blocks.items():
+        if len(ids) < 2 or len(ids) > MAX_BLOCK:
+            continue
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                shared[(a, b)].add(kind)
+
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    reasons = defaultdict(set)
+    for (a, b), kinds in shared.items():
+        if _score(kinds) < MATCH_SCORE:
+            continue
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+        reasons[a] |= kinds
+        reasons[b] |= kinds
+
+    dup_rows = [
+        {"company_id": cid, "canonical_id": find(cid), "reason": ",".join(sorted(reasons[cid]))[:64]}
+        for cid in sorted(parent) if find(cid) != cid
+    ]
+    for i in range(0, len(dup_rows), batch_size):
+        db.session.execute(insert_ignore(CompanyDuplicate, dup_rows[i:i + batch_size], ["company_id"]))
+    db.session.commit()
+    return {
+        "companies": companies,
+        "keys": sum(len(ids) for ids in blocks.values()),
+        "duplicates": len(dup_rows),
+        "clusters": len({r["canonical_id"] for r in dup_rows}),
+    }
+
+
+def is_duplicate():
+    # 重複と判定された企業の条件（送信・出力の対象外にする）
+    return db.exists().where(CompanyDuplicate.company_id == Company.id)
@@ -0,0 +1,540 @@
+import json, os, socket, threading, time, traceback
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlparse
+from sqlalchemy import and_, func, or_, select, update
+
+from models import db
+from models.frontier import FrontierEntry, HostLease
+from models.job import CrawlJob
+from models.log import CrawlLog, FetchLog
+from services.company_store import CompanyWriter, insert_ignore, load_known_sites
+from services.extractor import parse_html
+from services.fetcher import FetchPool, host_of
+from services.frontier import PRIORITY_PAGINATION, canonicalize, score
+from services.keywords import compile_keywords
+from services.sitemap import MAX_FILES as SITEMAP_MAX_FILES, SITEMAP_ENABLED, read_sitemap, sitemap_sources, wanted
+from services.metrics import record_crawl
+from services import instrumentation
+from services import scraper
+
+# ======================================================
+# 分散クロール（共有フロンティア）
+#   ・クロール対象 URL は crawl_frontier テーブルで共有し、複数プロセス / 複数コンテナの
+#     ワーカー（flask crawl-worker）が取り合う
+#   ・URL の取得権（リース）はホスト単位のリース crawl_host_leases とセットで取得する
+#     → 同じ企業サイト / 一覧サイトに同時に複数ワーカーがアクセスしない
+#   ・リースには期限があり、落ちたワーカーが持っていた URL は期限切れ後に別のワーカーが再取得
+#   ・取得権の確定は条件付き UPDATE の更新件数で判定（SELECT ... FOR UPDATE を使わないので SQLite でも動く）
+#   ・取得・解析の後、結果を保存する前にリースを延長し、延長できなかった（期限切れで別のワーカーが
+#     取得した）場合は保存しない → 時間のかかった URL でも企業の保存・件数の加算は 1 回だけ
+#   ・企業データの重複は companies.company_site の unique 制約（INSERT IGNORE）で排除
+#   ・sitemap 指定のジョブは sitemap 1 ファイルを 1 URL（kind=sitemap）として分担し、
+#     載っているページを一覧ページとして投入する（sitemap が読めた場合、一覧ページ内のリンクは辿らない）
+# ======================================================
+
+LEASE_SECONDS = int(os.getenv("CRAWL_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "3"))
+WORKER_THREADS = int(os.getenv("CRAWL_WORKER_THREADS", "4"))
+CLAIM_CANDIDATES = 64
+IDLE_SLEEP = (0.1, 2.0)  # 取得できる URL が無い間は待ち時間を倍々に延ばす（最小, 最大）
+LIMIT_CHECK_INTERVAL = 2.0
+PRIORITY_SITEMAP = PRIORITY_PAGINATION - 2
+
+
+def is_distributed(job):
+    return bool(job.get_params().get("distributed"))
+
+
+def enqueue(crawl_id, urls, kind, priority=None):
+    rows = {}
+    for u in urls:
+        key = canonicalize(u)[:512]
+        if key in rows:
+            continue
+        rows[key] = {
+            "crawl_id": crawl_id,
+            "url_key": key,
+            "url": u[:1024],
+            "host": host_of(u)[:255],
+            "kind": kind,
+            "priority": score(u) if priority is None else priority,
+            "status": "queued",
+        }
+    if not rows:
+        return 0
+    return max(db.session.execute(
+        insert_ignore(FrontierEntry, list(rows.values()), ["crawl_id", "url_key"])
+    ).rowcount, 0)
+
+
+def seed(job):
+    params = job.get_params()
+    enqueue(job.id, [scraper._normalize_url(params["seed_url"])], "listing")
+    if _sitemap_enabled(params):
+        enqueue(job.id, sitemap_sources(params["seed_url"]), "sitemap", PRIORITY_SITEMAP)
+    db.session.commit()
+
+
+# ------------------------------------------------------
+# リース
+# ------------------------------------------------------
+
+def _acquire_host(host, owner, now):
+    expires = now + timedelta(seconds=LEASE_SECONDS)
+    r = db.session.execute(
+        update(HostLease)
+        .where(HostLease.host == host, or_(HostLease.owner == owner, HostLease.expires < now))
+        .values(owner=owner, expires=expires)
+    )
+    if r.rowcount:
+        return True
+    r = db.session.execute(insert_ignore(HostLease, [{"host": host, "owner": owner, "expires": expires}], ["host"]))
+    return r.rowcount > 0
+
+
+def _release_host(host, owner):
+    db.session.execute(
+        update(HostLease).where(HostLease.host == host, HostLease.owner == owner).values(expires=datetime.utcnow())
+    )
+
+
+def _claimable(now):
+    return or_(
+        FrontierEntry.status == "queued",
+        and_(FrontierEntry.status == "leased", FrontierEntry.lease_expires < now),
+    )
+
+
+def claim(crawl_id, owner):
+    now = datetime.utcnow()
+    # 期限切れのまま再試行上限に達した URL は失敗扱いにする
+    db.session.execute(
+        update(FrontierEntry)
+        .where(FrontierEntry.crawl_id == crawl_id, FrontierEntry.status == "leased",
+               FrontierEntry.lease_expires < now, FrontierEntry.attempts >= MAX_ATTEMPTS)
+        .values(status="failed")
+    )
+    # 他のワーカーがリース中のホストは候補から外す
+    busy = select(HostLease.host).where(HostLease.expires >= now, HostLease.owner != owner)
+    candidates = (
+        db.session.query(FrontierEntry.id, FrontierEntry.host)
+        .filter(FrontierEntry.crawl_id == crawl_id, _claimable(now), FrontierEntry.host.not_in(busy))
+        .order_by(FrontierEntry.priority, FrontierEntry.id)
+        .limit(CLAIM_CANDIDATES)
+        .all()
+    )
+    db.session.commit()
+
+    tried = set()
+    for entry_id, host in candidates:
+        if host in tried:
+            continue
+        tried.add(host)
+        if not _acquire_host(host, owner, now):
+            db.session.commit()
+            continue
+        r = db.session.execute(
+            update(FrontierEntry)
+            .where(FrontierEntry.id == entry_id, _claimable(now))
+            .values(status="leased", lease_owner=owner, lease_expires=now + timedelta(seconds=LEASE_SECONDS),
+                    attempts=FrontierEntry.attempts + 1)
+        )
+        if r.rowcount:
+            db.session.commit()
+            return db.session.get(FrontierEntry, entry_id)
+        _release_host(host, owner)
+        db.session.commit()
+    return None
+
+
+def complete(entry, owner, status="done", result=None, matched=False):
+    db.session.execute(
+        update(FrontierEntry)
+        .where(FrontierEntry.id == entry.id, FrontierEntry.lease_owner == owner, FrontierEntry.status == "leased")
+        .values(status=status, matched=matched, lease_expires=None,
+                result=json.dumps(result, ensure_ascii=False) if result else None)
+    )
+    _release_host(entry.host, owner)
+    db.session.commit()
+
+
+def renew(entry, owner):
+    # 時間のかかる処理の後、結果を保存する前にリースを延長する（更新件数 0 = 期限切れで別のワーカーに渡った）
+    # 延長できた場合は LEASE_SECONDS の間は他のワーカーに取られないので、続けて保存してよい
+    now = datetime.utcnow()
+    r = db.session.execute(
+        update(FrontierEntry)
+        .where(FrontierEntry.id == entry.id, FrontierEntry.lease_owner == owner, FrontierEntry.status == "leased")
+        .values(lease_expires=now + timedelta(seconds=LEASE_SECONDS))
+    )
+    if not r.rowcount:
+        db.session.rollback()
+        return False
+    _acquire_host(entry.host, owner, now)
+    db.session.commit()
+    return True
+
+
+def _bump(job_id, **deltas):
+    # 複数ワーカーから同時に加算されるため、読み書きせず UPDATE ... SET x = x + n で更新する
+    values = {k: func.coalesce(getattr(CrawlJob, k), 0) + v for k, v in deltas.items() if v}
+    if values:
+        db.session.execute(update(CrawlJob).where(CrawlJob.id == job_id).values(**values))
+
+
+# ------------------------------------------------------
+# 1 URL の処理
+# ------------------------------------------------------
+
+class _JobContext:
+    # ワーカープロセス内でジョブごとに共有する設定・既知サイト
+    def __init__(self, job, pool):
+        params = job.get_params()
+        self.job_id = job.id
+        self.params = params
+        self.seed_url = params["seed_url"]
+        self.seed_host = urlparse(self.seed_url).netloc.replace("www.", "").lower()
+        self.allowed_domain = params.get("allowed_domain")
+        self.limit = params.get("limit") or 100
+        self.max_pages = params.get("max_pages") or 100
+        self.force_refresh = params.get("force_refresh", False)
+        self.keywords = compile_keywords(params.get("jp_keywords"))
+        prefilter = params.get("prefilter")
+        self.prefilter = (scraper.KEYWORD_PREFILTER if prefilter is None else prefilter) and bool(self.keywords)
+        self.sitemap = _sitemap_enabled(params)
+        self.sitemap_include = params.get("sitemap_include")
+        self.sitemap_exclude = params.get("sitemap_exclude")
+        self._sitemap_failed = False
+        self.extract_kwargs = {
+            "pool": pool,
+            "max_subpages": scraper.MAX_SUBPAGES if params.get("max_subpages") is None else params["max_subpages"],
+            "budget": params.get("subpage_budget"),
+        }
+        self.known = set() if self.force_refresh else load_known_sites()
+        self._limit_checked = 0.0
+        self._limit_reached = False
+        self._lock = threading.Lock()
+
+    def limit_reached(self):
+        with self._lock:
+            now = time.time()
+            if not self._limit_reached and now - self._limit_checked >= LIMIT_CHECK_INTERVAL:
+                self._limit_checked = now
+                self._limit_reached = _matched_count(self.job_id) >= self.limit
+            return self._limit_reached
+
+    def follow_links(self):
+        # sitemap からページを 1 件以上読めたジョブは、一覧ページ内のリンクを辿らない
+        # （sitemap は一覧ページより優先度が高く、同じホストの一覧ページより先に処理される）
+        # 途中で読めなくなった sitemap があれば、漏れた企業を拾えるようリンクも辿る
+        if not self.sitemap or self._sitemap_failed:
+            return True
+        results = [json.loads(r) for (r,) in db.session.query(FrontierEntry.result).filter(
+            FrontierEntry.crawl_id == self.job_id, FrontierEntry.kind == "sitemap", FrontierEntry.status == "done"
+        ) if r]
+        self._sitemap_failed = any(r.get("error") for r in results)
+        return self._sitemap_failed or not any(r.get("pages") for r in results)
+
+
+def _sitemap_enabled(params):
+    return SITEMAP_ENABLED if params.get("sitemap") is None else params["sitemap"]
+
+
+def _matched_count(crawl_id):
+    return db.session.query(func.count(FrontierEntry.id)).filter(
+        FrontierEntry.crawl_id == crawl_id, FrontierEntry.matched.is_(True)
+    ).scalar() or 0
+
+
+def _listing_count(crawl_id):
+    return db.session.query(func.count(FrontierEntry.id)).filter(
+        FrontierEntry.crawl_id == crawl_id, FrontierEntry.kind == "listing"
+    ).scalar() or 0
+
+
+def _sitemap_count(crawl_id):
+    return db.session.query(func.count(FrontierEntry.id)).filter(
+        FrontierEntry.crawl_id == crawl_id, FrontierEntry.kind == "sitemap"
+    ).scalar() or 0
+
+
+def _pages_visited(crawl_id):
+    return db.session.query(CrawlJob.pages_visited).filter(CrawlJob.id == crawl_id).scalar() or 0
+
+
+def _new_urls(crawl_id, urls):
+    # フロンティアにまだ無い URL（重複を除き、元の順番のまま）
+    keys = {}
+    for u in urls:
+        keys.setdefault(canonicalize(u)[:512], u)
+    if not keys:
+        return []
+    known = {k for (k,) in db.session.query(FrontierEntry.url_key).filter(
+        FrontierEntry.crawl_id == crawl_id, FrontierEntry.url_key.in_(list(keys))
+    )}
+    return [u for k, u in keys.items() if k not in known]
+
+
+def _process_listing(ctx, entry, owner):
+    # 投入済みの一覧ページが max_pages を超えていても（複数ワーカーが同時に投入した場合）、取得は max_pages まで
+    if _pages_visited(ctx.job_id) >= ctx.max_pages:
+        return "skipped", None, False
+    url = entry.url
+    html = scraper._fetch_page(url)
+    if not html:
+        return "failed", None, False
+    if not renew(entry, owner):
+        return "lost", None, False
+    try:
+        anchors = [a for a in parse_html(html).iter("a") if a.get("href") is not None]
+        hrefs = [a.get("href") for a in anchors]
+    except Exception:
+        return "failed", None, False
+
+    homepages = []
+    for hp in scraper._extract_homepage_links(hrefs, url, ctx.allowed_domain, ctx.seed_host):
+        if canonicalize(hp) not in ctx.known:
+            homepages.append(hp)
+    if ctx.prefilter:
+        homepages = scraper._prefilter(homepages, anchors, url, ctx.keywords)
+    # 企業HPは一覧ページより先に処理する（max_pages を使い切る前に企業を取り切る）
+    enqueue(ctx.job_id, homepages, "company", PRIORITY_PAGINATION - 1)
+
+    remaining = ctx.max_pages - _listing_count(ctx.job_id)
+    if remaining > 0 and ctx.follow_links():
+        next_urls = []
+        for href in hrefs:
+            next_url = scraper._normalize_url(urljoin(url, href))
+            if scraper._allowed(next_url, ctx.seed_url, ctx.allowed_domain):
+                next_urls.append(next_url)
+        enqueue(ctx.job_id, _new_urls(ctx.job_id, next_urls)[:remaining], "listing")
+    _bump(ctx.job_id, pages_visited=1)
+    db.session.commit()
+    return "done", None, False
+
+
+def _process_sitemap(ctx, entry, owner):
+    # sitemap 1 ファイル分。入れ子の sitemap は sitemap として、載っているページは一覧ページとして投入する
+    remaining = ctx.max_pages - _listing_count(ctx.job_id)
+    if remaining <= 0:
+        return "done", None, False
+    children, pages = [], []
+    error = None
+    entries = read_sitemap(entry.url)
+    try:
+        for kind, loc in entries:
+            if remaining <= len(pages):
+                break
+            if kind == "sitemap":
+                children.append(loc)
+            elif wanted(loc, ctx.sitemap_include, ctx.sitemap_exclude):
+                loc = scraper._normalize_url(loc)
+                if scraper._allowed(loc, ctx.seed_url, ctx.allowed_domain):
+                    pages.append(loc)
+    except Exception as e:
+        # 読めなかった sitemap は、そこまでに読めた分だけを投入する（ジョブ全体は止めない）
+        error = f"{type(e).__name__}: {e}"
+        print(f"Sitemap Error: {entry.url} {error}")
+    finally:
+        entries.close()
+    if not renew(entry, owner):
+        return "lost", None, False
+
+    enqueue(ctx.job_id, children[:max(SITEMAP_MAX_FILES - _sitemap_count(ctx.job_id), 0)], "sitemap", PRIORITY_SITEMAP)
+    enqueue(ctx.job_id, pages, "listing")
+    db.session.commit()
+    result = {"sitemaps": len(children), "pages": len(pages)}
+    if error:
+        result["error"] = error[:255]
+    return "done", result, False
+
+
+def _process_company(ctx, entry, owner, writer):
+    info = scraper._extract_company_info(entry.url, **ctx.extract_kwargs)
+    if not info:
+        return "failed", None, False
+    if not scraper._matches(info, ctx.keywords):
+        return "done", info, False
+    if not renew(entry, owner):
+        return "lost", None, False
+
+    before = writer.counts()
+    writer.add(info)
+    writer.flush()
+    after = writer.counts()
+    _bump(ctx.job_id, companies_found=1,
+          inserted=after["inserted"] - before["inserted"], existed=after["existed"] - before["existed"])
+    db.session.commit()
+    return "done", info, True
+
+
+def process(ctx, entry, owner, writer):
+    try:
+        if entry.kind == "company":
+            status, result, matched = _process_company(ctx, entry, owner, writer)
+        elif entry.kind == "sitemap":
+            status, result, matched = _process_sitemap(ctx, entry, owner)
+        else:
+            status, result, matched = _process_listing(ctx, entry, owner)
+    except Exception:
+        db.session.rollback()
+        traceback.print_exc()
+        status, result, matched = "failed", None, False
+    if status == "lost":
+        # 処理中にリースが切れて別のワーカーが取得した。結果は保存せず、そのワーカーに任せる
+        print(f"Lease Lost: {entry.url}")
+        return
+    complete(entry, owner, status, result, matched)
+
+
+# ------------------------------------------------------
+# 完了判定
+# ------------------------------------------------------
+
+def _pending(crawl_id):
+    now = datetime.utcnow()
+    return db.session.query(FrontierEntry.id).filter(
+        FrontierEntry.crawl_id == crawl_id,
+        or_(FrontierEntry.status == "queued",
+            and_(FrontierEntry.status == "leased",
+                 or_(FrontierEntry.lease_expires >= now, FrontierEntry.attempts < MAX_ATTEMPTS))),
+    ).first() is not None
+
+
+def finalize(job_id, limit_reached=False):
+    if limit_reached:
+        db.session.execute(
+            update(FrontierEntry)
+            .where(FrontierEntry.crawl_id == job_id, FrontierEntry.status == "queued")
+            .values(status="skipped")
+        )
+    elif _pending(job_id):
+        db.session.commit()
+        return False
+
+    # 完了処理は 1 ワーカーだけが行う（status を条件にした UPDATE の更新件数で判定）
+    now = datetime.utcnow()
+    total = len(result_rows(job_id))
+    r = db.session.execute(
+        update(CrawlJob).where(CrawlJob.id == job_id, CrawlJob.status == "running")
+        .values(status="done", finished_at=now, total=total)
+    )
+    db.session.commit()
+    if not r.rowcount:
+        return False
+
+    job = db.session.get(CrawlJob, job_id)
+    fetches, errors, nbytes = db.session.query(
+        func.count(FetchLog.id),
+        func.count(FetchLog.error),
+        func.coalesce(func.sum(FetchLog.bytes), 0),
+    ).filter(FetchLog.crawl_id == job_id).one()
+    by_domain = dict(
+        db.session.query(FetchLog.host, func.count(FetchLog.id)).filter(FetchLog.crawl_id == job_id).group_by(FetchLog.host)
+    )
+    db.session.add(CrawlLog(
+        crawl_id=job_id, seed_url=job.get_params().get("seed_url"), started_at=job.started_at, finished_at=now,
+        duration_seconds=job.elapsed_seconds(), pages=job.pages_visited, companies=total,
+        inserted=job.inserted or 0, existed=job.existed or 0, fetches=fetches, errors=errors, bytes=nbytes,
+        by_domain=json.dumps(by_domain, ensure_ascii=False),
+    ))
+    db.session.commit()
+    record_crawl(job.elapsed_seconds(), job.pages_visited, total)
+    print(f"Crawl {job_id} done: pages={job.pages_visited} companies={total}")
+    return True
+
+
+def result_rows(crawl_id):
+    rows = {}
+    query = (
+        db.session.query(FrontierEntry.result)
+        .filter(FrontierEntry.crawl_id == crawl_id, FrontierEntry.kind == "company", FrontierEntry.matched.is_(True))
+        .order_by(FrontierEntry.id)
+    )
+    for (result,) in query:
+        r = json.loads(result)
+        key = r.get("homepage_url") or r.get("source_url")
+        if key and key not in rows:
+            rows[key] = r
+    return list(rows.values())
+
+
+# ------------------------------------------------------
+# ワーカー
+# ------------------------------------------------------
+
+def _running_jobs(crawl_id=None):
+    query = db.session.query(CrawlJob).filter(CrawlJob.status == "running")
+    if crawl_id:
+        query = query.filter(CrawlJob.id == crawl_id)
+    return [job for job in query if is_distributed(job)]
+
+
+def run_worker(app, threads=None, crawl_id=None, exit_when_idle=False):
+    threads = max(1, int(threads or WORKER_THREADS))
+    pool = FetchPool(threads)
+    contexts = {}
+    ctx_lock = threading.Lock()
+    stop = threading.Event()
+
+    def context_for(job):
+        with ctx_lock:
+            ctx = contexts.get(job.id)
+            if ctx is None:
+                ctx = contexts[job.id] = _JobContext(job, pool)
+            return ctx
+
+    def loop(n):
+        owner = f"{socket.gethostname()}:{os.getpid()}:{n}"
+        with app.app_context():
+            writers = {}
+            recorders = {}
+            idle = IDLE_SLEEP[0]
+            while not stop.is_set():
+                jobs = _running_jobs(crawl_id)
+                if not jobs and exit_when_idle:
+                    break
+                worked = False
+                for job in jobs:
+                    ctx = context_for(job)
+                    if ctx.limit_reached():
+                        finalize(job.id, limit_reached=True)
+                        continue
+                    entry = claim(job.id, owner)
+                    if entry is None:
+                        finalize(job.id)
+                        continue
+                    writer = writers.setdefault(job.id, CompanyWriter(1, ctx.force_refresh, ctx.seed_host))
+                    recorder = recorders.get(job.id)
+                    if recorder is None:
+                        recorder = recorders[job.id] = instrumentation.CrawlRecorder(job.id, ctx.seed_url)
+                        recorder.force_refresh = ctx.force_refresh
+                    instrumentation.bind(recorder)
+                    process(ctx, entry, owner, writer)
+                    instrumentation.bind(None)
+                    recorder.flush()
+                    worked = True
+                db.session.commit()
+                if worked:
+                    idle = IDLE_SLEEP[0]
+                else:
+                    for recorder in recorders.values():
+                        recorder.flush(force=True)
+                    stop.wait(idle)
+                    idle = min(idle * 2, IDLE_SLEEP[1])
+            for recorder in recorders.values():
+                recorder.flush(force=True)
+
+    workers = [threading.Thread(target=loop, args=(n,), name=f"crawl-worker-{n}", daemon=True) for n in range(threads)]
+    for t in workers:
+        t.start()
+    try:
+        while any(t.is_alive() for t in workers):
+            for t in workers:
+                t.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in workers:
+            t.join()
+    finally:
+        pool.close()
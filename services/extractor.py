@@ -0,0 +1,296 @@
+import re
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+# ======================================================
+# 企業HPからの項目抽出
+#   ・extract_fields      : lxml で 1 回だけパースし、1 回の走査で全項目の候補を集める（本番用）
+#   ・extract_fields_bs4  : 従来の BeautifulSoup 実装（パース失敗時のフォールバック / ベンチマーク比較用）
+#   どちらも戻り値は同じ（company_name / contact_url / email / phone / address）
+# ======================================================
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"\d{2,4}-\d{2,4}-\d{3,4}")
+POSTAL_RE = re.compile(r"(〒\s*\d{3}-\d{4}[\s　]*[^\n]{0,50})")
+XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+# </body> / </html> の後ろに書かれた要素は libxml2 では html 要素の外（別のルート）になり走査されないため、
+# 終了タグを取り除いて文書の末尾で閉じさせる（html.parser と同じく本文の続きとして扱う）
+_DOC_END_RE = re.compile(r"</(body|html)\s*>", re.I)
+
+CONTACT_LABELS = ["お問い合わせ", "お問合せ", "contact", "inquiry"]
+
+# 会社概要・企業情報・アクセス等の下層ページ候補（ラベル / URL に含まれる語、値が大きいほど優先）
+PROFILE_LABELS = {
+    "会社概要": 5, "企業概要": 5, "会社情報": 5, "企業情報": 5, "会社案内": 4, "企業案内": 4,
+    "アクセス": 3, "所在地": 3, "事業所": 2, "拠点": 2, "お問い合わせ": 1, "お問合せ": 1,
+}
+PROFILE_HREFS = {
+    "company": 4, "about": 4, "profile": 4, "corporate": 4, "outline": 4, "gaiyo": 4, "gaiyou": 4,
+    "access": 3, "office": 2, "contact": 1, "inquiry": 1,
+}
+_SKIP_LINK_RE = re.compile(r"^(mailto:|tel:|javascript:|#)|\.(pdf|jpe?g|png|gif|zip|docx?|xlsx?)$", re.I)
+CONTACT_HREFS = ["contact", "inquiry"]
+ADDRESS_KEYS = ["住所", "所在地"]
+
+# get_text() に含めない要素（bs4 が Script / Stylesheet / TemplateString / RubyText として扱うもの）
+_SKIP_TAGS = {"script", "style", "template", "rt", "rp"}
+
+
+def parse_html(html):
+    # lxml は XML 宣言付きの str を受け付けないため取り除く
+    return lxml_html.document_fromstring(_DOC_END_RE.sub("", XML_DECL_RE.sub("", html, count=1)))
+
+
+def extract_fields(html, base_url, with_links=False):
+    try:
+        root = parse_html(html)
+    except Exception:
+        return extract_fields_bs4(html, base_url)
+
+    tokens = []   # get_text(" ", strip=True) 用
+    raw = []      # get_text() 用（リンク文言）
+    spans = {}    # 要素 -> [tokens 開始, tokens 終了, raw 開始, raw 終了]
+
+    headings = []
+    title = None
+    og_name = None
+    anchors = []
+    dls = []
+    open_dls = []
+    trs = []
+    open_trs = []
+
+    def add_text(s):
+        if s:
+            raw.append(s)
+            s = s.strip()
+            if s:
+                tokens.append(s)
+
+    skip = 0
+    stack = [(root, False)]
+    while stack:
+        el, closing = stack.pop()
+        tag = el.tag
+
+        if closing:
+            spans[el][1] = len(tokens)
+            spans[el][3] = len(raw)
+            if tag in _SKIP_TAGS:
+                skip -= 1
+            elif tag == "dl":
+                open_dls.pop()
+            elif tag == "tr":
+                open_trs.pop()
+            if not skip:
+                add_text(el.tail)
+            continue
+
+        if not isinstance(tag, str):
+            # コメント・処理命令は本文に含めない（後続テキストのみ）
+            if not skip:
+                add_text(el.tail)
+            continue
+
+        spans[el] = [len(tokens), 0, len(raw), 0]
+
+        if tag in ("h1", "h2"):
+            headings.append(el)
+        elif tag == "title":
+            if title is None:
+                title = el
+        elif tag == "meta":
+            if og_name is None and el.get("property") == "og:site_name":
+                og_name = el
+        elif tag == "a":
+            if el.get("href") is not None:
+                anchors.append(el)
+        elif tag == "dl":
+            rec = {"dt": [], "dd": []}
+            dls.append(rec)
+            open_dls.append(rec)
+        elif tag in ("dt", "dd"):
+            for rec in open_dls:
+                rec[tag].append(el)
+        elif tag == "tr":
+            rec = {"th": None, "td": None}
+            trs.append(rec)
+            open_trs.append(rec)
+        elif tag in ("th", "td"):
+            for rec in open_trs:
+                if rec[tag] is None:
+                    rec[tag] = el
+
+        if tag in _SKIP_TAGS:
+            skip += 1
+        if not skip:
+            add_text(el.text)
+
+        stack.append((el, True))
+        for child in reversed(el):
+            stack.append((child, False))
+
+    def text_of(el):
+        s = spans[el]
+        return " ".join(tokens[s[0]:s[1]])
+
+    text = " ".join(tokens)
+
+    company_name = ""
+    for h in headings:
+        t = text_of(h)
+        if t:
+            company_name = t
+            break
+    else:
+        s = _string(title) if title is not None else None
+        if s:
+            company_name = s.strip()
+        elif og_name is not None and og_name.get("content"):
+            company_name = og_name.get("content").strip()
+
+    contact_url = ""
+    for a in anchors:
+        s = spans[a]
+        label = "".join(raw[s[2]:s[3]]).strip().lower()
+        href = a.get("href")
+        if any(l.lower() in label for l in CONTACT_LABELS) or any(x in href.lower() for x in CONTACT_HREFS):
+            contact_url = urljoin(base_url, href)
+            break
+
+    address = _address_from(dls, trs, text_of, text)
+
+    fields = {
+        "company_name": company_name,
+        "contact_url": contact_url,
+        "email": _first(EMAIL_RE, text),
+        "phone": _first(PHONE_RE, text),
+        "address": address,
+    }
+    if with_links:
+        fields["subpage_links"] = _subpage_links(
+            ((a.get("href"), "".join(raw[spans[a][2]:spans[a][3]])) for a in anchors), base_url
+        )
+    return fields
+
+
+def _subpage_links(anchors, base_url):
+    # 同一ホスト内の会社概要・アクセス等へのリンクを優先度順に返す
+    base_host = urlparse(base_url).netloc.lower().replace("www.", "")
+    scores = {}
+    for href, label in anchors:
+        href = href.strip()
+        if not href or _SKIP_LINK_RE.search(href):
+            continue
+        url = urljoin(base_url, href).split("#")[0]
+        parts = urlparse(url)
+        if parts.scheme not in ("http", "https") or parts.netloc.lower().replace("www.", "") != base_host:
+            continue
+        path = parts.path.lower()
+        if path.rstrip("/") == urlparse(base_url).path.lower().rstrip("/"):
+            continue
+        score = max([v for k, v in PROFILE_LABELS.items() if k in label] or [0])
+        score += max([v for k, v in PROFILE_HREFS.items() if k in path] or [0])
+        if score and score > scores.get(url, 0):
+            scores[url] = score
+    return sorted(scores, key=lambda u: -scores[u])
+
+
+def _address_from(dls, trs, text_of, text):
+    for rec in dls:
+        for dt, dd in zip(rec["dt"], rec["dd"]):
+            k = text_of(dt)
+            if any(key in k for key in ADDRESS_KEYS):
+                return text_of(dd)
+
+    for rec in trs:
+        if rec["th"] is not None and rec["td"] is not None:
+            k = text_of(rec["th"])
+            if any(key in k for key in ADDRESS_KEYS):
+                return text_of(rec["td"])
+
+    m = POSTAL_RE.search(text)
+    return m.group(1) if m else ""
+
+
+def _string(el):
+    # bs4 の Tag.string 相当（子ノードが 1 つだけの場合のみ文字列を返す）
+    children = list(el)
+    if not children:
+        return el.text
+    if el.text or len(children) != 1 or children[0].tail:
+        return None
+    child = children[0]
+    if not isinstance(child.tag, str):
+        return child.text
+    return _string(child)
+
+
+def _first(pattern, text):
+    m = pattern.search(text)
+    return m.group(0) if m else ""
+
+
+# ------------------------------------------------------
+# 従来実装（BeautifulSoup / html.parser）
+# ------------------------------------------------------
+
+def extract_fields_bs4(html, base_url):
+    soup = BeautifulSoup(html, "html.parser")
+    text = soup.get_text(" ", strip=True)
+
+    return {
+        "company_name": _company_name(soup),
+        "contact_url": _contact_url(soup, base_url),
+        "email": _first(EMAIL_RE, text),
+        "phone": _first(PHONE_RE, text),
+        "address": _address(soup, text),
+    }
+
+
+def _company_name(soup):
+    for h in soup.find_all(["h1", "h2"]):
+        t = h.get_text(" ", strip=True)
+        if t:
+            return t
+    if soup.title and soup.title.string:
+        return soup.title.string.strip()
+    og = soup.find("meta", property="og:site_name")
+    if og and og.get("content"):
+        return og["content"].strip()
+    return ""
+
+
+def _contact_url(soup, base_url):
+    for a in soup.find_all("a", href=True):
+        label = (a.get_text() or "").strip()
+        href = a["href"].lower()
+        if any(l.lower() in label.lower() for l in CONTACT_LABELS) or any(x in href for x in CONTACT_HREFS):
+            return urljoin(base_url, a["href"])
+    return ""
+
+
+def _address(soup, text):
+    for dl in soup.find_all("dl"):
+        dts = dl.find_all("dt")
+        dds = dl.find_all("dd")
+        for dt, dd in zip(dts, dds):
+            k = dt.get_text(" ", strip=True)
+            v = dd.get_text(" ", strip=True)
+            if "住所" in k or "所在地" in k:
+                return v
+
+    for tr in soup.find_all("tr"):
+        th, td = tr.find("th"), tr.find("td")
+        if th and td:
+            k = th.get_text(" ", strip=True)
+            v = td.get_text(" ", strip=True)
+            if "住所" in k or "所在地" in k:
+                return v
+
+    m = POSTAL_RE.search(text)
+    if m:
+        return m.group(1)
+
+    return ""
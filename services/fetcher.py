@@ -0,0 +1,289 @@
+import codecs, os, re, socket, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from charset_normalizer import from_bytes
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+
+from services import instrumentation
+from services.politeness import get_scheduler
+
+# ======================================================
+# 並列取得エンジン
+#   ・全スレッドで共有する接続プール付き Session
+#   ・全体の同時実行数（ThreadPoolExecutor）＋ ホスト単位の同時接続数（Semaphore）
+#   ・concurrency=1 の場合は従来どおり逐次実行
+#   ・企業ごとの下層ページ取得は別のプール（subpage）で実行（同じプール内で待ち合わせてデッドロックしないように）
+#   ・新規接続時は DNS 解決と TCP/TLS 接続の時間を計測（services/instrumentation へ渡す）
+#   ・map はホストごとに振り分け、待ち時間の短いホストから投入する
+#     （アクセス間隔で待たされるホスト / 遅いホストがスレッドを占有して他のホストを止めない）
+#   ・本文はストリームで読む（read_body / decode_html）
+#     ・Content-Type が HTML 以外（PDF / 画像など）はヘッダーだけで打ち切る
+#     ・MAX_BODY_BYTES を超える分は読まない
+#     ・文字コードは HTTP ヘッダー → BOM → <meta charset> の順に決め、無い場合のみ先頭 DETECT_BYTES で推定
+#       （全文に対する文字コード推定は大きな Shift_JIS / EUC-JP のページで CPU を使う）
+# ======================================================
+
+DEFAULT_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+DEFAULT_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+SUBPAGE_CONCURRENCY = int(os.getenv("CRAWL_SUBPAGE_CONCURRENCY", "8"))
+USER_AGENT = "Mozilla/5.0"
+MAX_BODY_BYTES = int(os.getenv("CRAWL_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+DETECT_BYTES = 64 * 1024
+META_SCAN_BYTES = 8 * 1024
+READ_CHUNK = 64 * 1024
+HTML_TYPES = {"text/html", "application/xhtml+xml", "application/xml", "text/xml"}
+
+_CHARSET_PARAM_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+# ラベルは Shift_JIS でも実際は Windows 拡張（機種依存文字）を含むページが多い
+_CHARSET_ALIASES = {"shift_jis": "cp932", "shift-jis": "cp932", "sjis": "cp932", "x-sjis": "cp932",
+                    "windows-31j": "cp932", "ms_kanji": "cp932", "euc-jp": "euc_jis_2004", "x-euc-jp": "euc_jis_2004",
+                    "iso-8859-1": "cp1252", "latin1": "cp1252", "us-ascii": "utf-8", "ascii": "utf-8"}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                size = max(DEFAULT_CONCURRENCY, 10)
+                adapter = TimedAdapter(pool_connections=size, pool_maxsize=size)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                s.headers["User-Agent"] = USER_AGENT
+                _session = s
+    return _session
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        # DNS 解決を先に行って時間を分けて計測し、解決済みのアドレスへ順に接続する
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            return super()._new_conn()
+        self._dns_seconds = time.perf_counter() - t0
+
+        host = self._dns_host
+        error = None
+        try:
+            for info in infos:
+                self._dns_host = info[4][0]
+                try:
+                    sock = super()._new_conn()
+                except Exception as e:
+                    error = e
+                    continue
+                return sock
+        finally:
+            self._dns_host = host
+        raise error
+
+    def connect(self):
+        # 接続時間は TCP 接続 + TLS ハンドシェイク（DNS 解決分を除く）
+        self._dns_seconds = 0.0
+        t0 = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - t0
+        instrumentation.record_connect(self._dns_seconds, elapsed - self._dns_seconds)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+class HostLimiter:
+    def __init__(self, per_host):
+        self.per_host = max(1, int(per_host))
+        self._sems = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        host = host_of(url)
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.BoundedSemaphore(self.per_host)
+        return sem
+
+
+class FetchPool:
+    def __init__(self, concurrency=None, per_host=None, recorder=None):
+        self.concurrency = max(1, int(concurrency or DEFAULT_CONCURRENCY))
+        self.recorder = recorder
+        self.limiter = HostLimiter(per_host or DEFAULT_PER_HOST)
+        self._executor = None
+        self._sub_executor = None
+        self._sub_lock = threading.Lock()
+        self._local = threading.local()
+        if self.concurrency > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fetch")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._sub_executor:
+            self._sub_executor.shutdown(wait=True)
+            self._sub_executor = None
+
+    def submit_subpage(self, fn, url):
+        with self._sub_lock:
+            if self._sub_executor is None:
+                workers = SUBPAGE_CONCURRENCY if self.concurrency > 1 else 1
+                self._sub_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="subpage")
+        # 下層ページもホスト単位の同時接続数の上限に従う
+        # 企業HPの取得（_run）が同じホストの枠を持っている場合は、その枠を下層ページで 1 件ずつ使う
+        # （企業HPの処理は下層ページの完了を待っているだけなので、枠をもう 1 つ取ると上限 1 のときに進まない）
+        borrowed = getattr(self._local, "borrowed", None)
+        slot = borrowed[1] if borrowed and borrowed[0] == host_of(url) else self.limiter.slot(url)
+
+        def fetch():
+            with slot:
+                return fn(url)
+
+        recorder = self.recorder or instrumentation.current()
+        return self._sub_executor.submit(instrumentation.bound(recorder, fetch))
+
+    def _run(self, fn, url):
+        instrumentation.bind(self.recorder)
+        try:
+            with self.limiter.slot(url):
+                self._local.borrowed = (host_of(url), threading.Lock())
+                try:
+                    return fn(url)
+                finally:
+                    self._local.borrowed = None
+        finally:
+            instrumentation.bind(None)
+
+    def map(self, fn, urls):
+        # 戻り値の順序は urls と同じ（逐次実行時と CSV / DB の出力が一致するように）
+        urls = list(urls)
+        if not self._executor or len(urls) <= 1:
+            return [fn(u) for u in urls]
+
+        queues = {}
+        for i, u in enumerate(urls):
+            queues.setdefault(host_of(u), deque()).append(i)
+        scheduler = get_scheduler()
+        results = [None] * len(urls)
+        running = {}
+        futures = {}
+        while queues or futures:
+            # 同時実行数に空きがある分だけ、ホスト単位の上限内で次に取得できるまでが短い順に投入
+            hosts = [h for h in queues if running.get(h, 0) < self.limiter.per_host]
+            hosts.sort(key=lambda h: scheduler.ready_in(urls[queues[h][0]]))
+            for h in hosts[:self.concurrency - len(futures)]:
+                i = queues[h].popleft()
+                if not queues[h]:
+                    del queues[h]
+                running[h] = running.get(h, 0) + 1
+                futures[self._executor.submit(self._run, fn, urls[i])] = (i, h)
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for f in done:
+                i, h = futures.pop(f)
+                running[h] -= 1
+                results[i] = f.result()
+        return results
+
+
+class NotHtml(Exception):
+    # HTML 以外の Content-Type（本文は読まずに打ち切った）
+    pass
+
+
+def read_body(r, max_bytes=None):
+    # stream=True で取得したレスポンスから HTML の本文（バイト列）を上限まで読む
+    mime = (r.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+    if mime and mime not in HTML_TYPES:
+        r.close()
+        raise NotHtml(mime)
+
+    limit = max_bytes or MAX_BODY_BYTES
+    buf = bytearray()
+    try:
+        for chunk in r.iter_content(READ_CHUNK):
+            buf += chunk
+            if len(buf) >= limit:
+                del buf[limit:]
+                break
+    finally:
+        # 途中で打ち切った場合は接続ごと閉じる（読み切った場合は接続プールに戻る）
+        r.close()
+    return buf
+
+
+def decode_html(body, content_type=None):
+    # (text, encoding) を返す
+    encoding = resolve_charset(content_type, body)
+    return body.decode(encoding, errors="replace"), encoding
+
+
+def resolve_charset(content_type, body):
+    m = _CHARSET_PARAM_RE.search(content_type or "")
+    encoding = _codec(m.group(1)) if m else None
+    if encoding:
+        return encoding
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    m = _META_CHARSET_RE.search(body[:META_SCAN_BYTES])
+    encoding = _codec(m.group(1).decode("ascii", "ignore")) if m else None
+    if encoding:
+        return encoding
+    # 末尾のマルチバイト文字が途中で切れていても推定には影響しない
+    best = from_bytes(body[:DETECT_BYTES]).best() if body else None
+    return _codec(best.encoding) if best else "utf-8"
+
+
+def _codec(label):
+    label = label.strip().lower()
+    label = _CHARSET_ALIASES.get(label, label)
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
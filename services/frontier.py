@@ -0,0 +1,117 @@
+import re
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# ======================================================
+# クロール対象 URL のキュー（フロンティア）
+#   ・優先度ごとの deque で push / pop とも O(1)
+#   ・キュー投入済み + 訪問済みの URL を正規化キーで管理し、二重投入しない
+#   ・正規化: http/https・www 有無・既定ポート・末尾スラッシュ・トラッキング用クエリ・フラグメントを同一視
+#   ・優先度: ページ送り > カテゴリ/一覧 > その他 > 記事/ニュース
+#     （max_pages を企業一覧が載っているページに優先して使う）
+# ======================================================
+
+PRIORITY_PAGINATION = 0
+PRIORITY_LISTING = 1
+PRIORITY_DEFAULT = 2
+PRIORITY_ARTICLE = 3
+LEVELS = 4
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "yclid", "dclid", "msclkid", "_ga", "_gl",
+    "mc_cid", "mc_eid", "ref", "ref_src", "sessionid", "phpsessid", "sid",
+}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_INDEX_RE = re.compile(r"/index\.(html?|php|asp|aspx|jsp)$", re.I)
+
+_PAGINATION_RE = re.compile(
+    r"([?&](page|paged|pg|p|pno|offset|start)=\d+)|(/page/\d+)|(/p\d+/?$)|(_\d+\.html?$)", re.I
+)
+_LISTING_RE = re.compile(
+    r"(?<![a-z])(list|lists|ichiran|category|categories|cat|area|pref|region|search|members?|company|companies|"
+    r"kigyo|gyoshu|industry|directory|shops?)(?![a-z])", re.I
+)
+_ARTICLE_RE = re.compile(
+    r"(/news/|/blog/|/column/|/topics/|/article|/entry/|/post/|/information/|/info/|/\d{4}/\d{1,2}/)", re.I
+)
+
+
+def canonicalize(url):
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    scheme = parts.scheme.lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    path = _INDEX_RE.sub("/", path)
+    if len(path) > 1 and path.endswith("/"):
+        path = path[:-1]
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    # スキームは区別しない（http と https は同一ページとして扱う）
+    return urlunsplit(("", host, path, urlencode(sorted(query)), ""))
+
+
+def score(url):
+    parts = urlsplit(url)
+    target = parts.path + ("?" + parts.query if parts.query else "")
+    if _PAGINATION_RE.search(target):
+        return PRIORITY_PAGINATION
+    if _ARTICLE_RE.search(parts.path):
+        return PRIORITY_ARTICLE
+    if _LISTING_RE.search(target):
+        return PRIORITY_LISTING
+    return PRIORITY_DEFAULT
+
+
+class Frontier:
+    def __init__(self):
+        self._queues = [deque() for _ in range(LEVELS)]
+        self._seen = set()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def seen(self, url):
+        return canonicalize(url) in self._seen
+
+    def push(self, url, priority=None):
+        key = canonicalize(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        if priority is None:
+            priority = score(url)
+        self._queues[min(max(priority, 0), LEVELS - 1)].append(url)
+        self._size += 1
+        return True
+
+    def pop(self):
+        for q in self._queues:
+            if q:
+                self._size -= 1
+                return q.popleft()
+        raise IndexError("pop from empty frontier")
+
+    def state(self):
+        # チェックポイント保存用（JSON 化できる形）
+        return {"queues": [list(q) for q in self._queues], "seen": sorted(self._seen)}
+
+    @classmethod
+    def from_state(cls, state):
+        f = cls()
+        for i, urls in enumerate(state.get("queues", [])[:LEVELS]):
+            f._queues[i].extend(urls)
+        f._seen = set(state.get("seen", []))
+        f._size = sum(len(q) for q in f._queues)
+        return f
@@ -0,0 +1,204 @@
+import os, time, sqlite3, hashlib, threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# ======================================================
+# HTTP レスポンスキャッシュ（ディスク保存）
+#   ・キー: 正規化 URL
+#   ・保存内容: デコード済み本文 / 判定済みエンコーディング / ETag / Last-Modified
+#   ・TTL 以内はネットワークに出ずに返す。TTL 超過後は条件付き GET で再検証し、304 ならディスクから返す
+#   ・合計サイズが上限を超えたら最終アクセスが古い順に削除
+#     合計サイズはプロセス内で加算し、他プロセス分は EVICT_SYNC_PUTS 回ごとに SUM で取り直す
+#   ・index.db は全ワーカー / crawl-worker で共有するため、ロック待ち（database is locked）などの失敗は
+#     例外にせず、取得はキャッシュなし・保存はスキップとして扱う（クロールは止めない）
+#     失敗した書き込みはロールバックし、他のプロセスを止める書き込みトランザクションを残さない
+# ======================================================
+
+CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") == "1"
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.getcwd(), "instance", "http_cache"))
+CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", str(24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+EVICT_SYNC_PUTS = int(os.getenv("HTTP_CACHE_EVICT_SYNC_PUTS", "100"))
+DB_TIMEOUT = 5
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def cache_key(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path[:-1]
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class CacheEntry:
+    def __init__(self, url, text, encoding, etag, last_modified, fetched_at):
+        self.url = url
+        self.text = text
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl=None):
+        ttl = CACHE_TTL if ttl is None else ttl
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total = None
+        self._puts = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=DB_TIMEOUT,
+                                   check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, encoding TEXT,"
+                " size INTEGER, fetched_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            try:
+                yield self._db()
+            except sqlite3.Error:
+                try:
+                    self._conn.rollback()
+                except (sqlite3.Error, AttributeError):
+                    pass
+                raise
+
+    def _path(self, key):
+        h = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, h[:2], h + ".html")
+
+    def get(self, url):
+        try:
+            return self._get(url)
+        except (sqlite3.Error, OSError) as e:
+            print(f"HttpCache Error: get {type(e).__name__} {e}")
+            return None
+
+    def _get(self, url):
+        key = cache_key(url)
+        with self._locked() as db:
+            row = db.execute(
+                "SELECT url, etag, last_modified, encoding, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                db.commit()
+                return None
+            db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+        return CacheEntry(row[0], text, row[3], row[1], row[2], row[4])
+
+    def put(self, url, text, encoding=None, etag=None, last_modified=None):
+        try:
+            self._put(url, text, encoding, etag, last_modified)
+        except (sqlite3.Error, OSError) as e:
+            print(f"HttpCache Error: put {type(e).__name__} {e}")
+
+    def _put(self, url, text, encoding, etag, last_modified):
+        key = cache_key(url)
+        path = self._path(key)
+        data = text.encode("utf-8")
+        now = time.time()
+        with self._locked() as db:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            # 置き換える場合は元のエントリの分を合計サイズから引く
+            old = db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "REPLACE INTO entries (key, url, etag, last_modified, encoding, size, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, encoding, len(data), now, now),
+            )
+            db.commit()
+            self._evict(len(data) - ((old[0] or 0) if old else 0))
+
+    def revalidated(self, url):
+        # 304 Not Modified を受けた時は取得時刻だけ更新する
+        try:
+            with self._locked() as db:
+                db.execute(
+                    "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                    (time.time(), time.time(), cache_key(url)),
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"HttpCache Error: revalidated {type(e).__name__} {e}")
+
+    def _evict(self, added):
+        db = self._db()
+        self._puts += 1
+        if self._total is None or self._puts % EVICT_SYNC_PUTS == 0:
+            self._total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        else:
+            self._total += added
+        total = self._total
+        if total <= self.max_bytes:
+            return
+        # 上限の 9 割まで古い順に削除（毎回の削除を避ける）
+        target = int(self.max_bytes * 0.9)
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size or 0
+        db.commit()
+        self._total = total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
@@ -0,0 +1,271 @@
+import json, os, threading, time
+from bisect import bisect_left
+from datetime import datetime
+from urllib.parse import urlparse
+from sqlalchemy import insert
+
+from models import db
+from models.log import FetchLog, CrawlLog
+
+# ======================================================
+# クロールの計測
+#   ・1 リクエストごと: ホスト / ステータス / バイト数 / DNS・接続・合計時間 / デコード時間 / パース時間
+#   ・1 クロールごと: 集計を crawl_logs に保存
+#   ・リクエスト単位の記録は fetch_logs にバッチで書き込む（書き込みはクロールのメインスレッドのみ）
+#   ・プロセス内のヒストグラム / エラー率を Prometheus のテキスト形式で出力（/metrics）
+# ======================================================
+
+LOG_BATCH_SIZE = int(os.getenv("FETCH_LOG_BATCH_SIZE", "200"))
+MAX_HOST_LABELS = int(os.getenv("METRICS_MAX_HOSTS", "500"))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGES = ("dns", "connect", "total", "decode", "parse", "render")
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        out = []
+        cumulative = 0
+        for le, n in zip(self.buckets, self.counts):
+            cumulative += n
+            out.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels}le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels.rstrip(',')}}} {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels.rstrip(',')}}} {self.count}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.errors = {}
+        self.bytes = {}
+        self.latency = {}
+        self.stages = {s: Histogram() for s in STAGES}
+
+    def _host_label(self, host):
+        # ラベル数が増えすぎないよう、上限を超えたホストは other にまとめる
+        if host in self.latency or len(self.latency) < MAX_HOST_LABELS:
+            return host
+        return "other"
+
+    def observe_fetch(self, rec):
+        with self._lock:
+            host = self._host_label(rec["host"])
+            key = (host, str(rec["status"] or 0), rec["cache"])
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if rec["error"]:
+                self.errors[host] = self.errors.get(host, 0) + 1
+            self.bytes[host] = self.bytes.get(host, 0) + rec["bytes"]
+            if rec["cache"] != "hit":
+                self.latency.setdefault(host, Histogram()).observe(rec["total_ms"] / 1000)
+            for stage in ("dns", "connect", "total", "decode"):
+                v = rec.get(f"{stage}_ms")
+                if v is not None:
+                    self.stages[stage].observe(v / 1000)
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def render(self):
+        with self._lock:
+            out = [
+                "# HELP crawler_requests_total Fetches by host, HTTP status (0 = no response) and cache result.",
+                "# TYPE crawler_requests_total counter",
+            ]
+            for (host, status, cache), n in sorted(self.requests.items()):
+                out.append(f'crawler_requests_total{{host="{_esc(host)}",status="{status}",cache="{cache}"}} {n}')
+            out += ["# HELP crawler_errors_total Failed fetches by host.", "# TYPE crawler_errors_total counter"]
+            for host, n in sorted(self.errors.items()):
+                out.append(f'crawler_errors_total{{host="{_esc(host)}"}} {n}')
+            out += ["# HELP crawler_response_bytes_total Body bytes by host.", "# TYPE crawler_response_bytes_total counter"]
+            for host, n in sorted(self.bytes.items()):
+                out.append(f'crawler_response_bytes_total{{host="{_esc(host)}"}} {n}')
+            out += [
+                "# HELP crawler_fetch_duration_seconds Network fetch latency by host.",
+                "# TYPE crawler_fetch_duration_seconds histogram",
+            ]
+            for host, h in sorted(self.latency.items()):
+                out += h.lines("crawler_fetch_duration_seconds", f'host="{_esc(host)}",')
+            out += [
+                "# HELP crawler_stage_duration_seconds Time spent per pipeline stage.",
+                "# TYPE crawler_stage_duration_seconds histogram",
+            ]
+            for stage, h in self.stages.items():
+                out += h.lines("crawler_stage_duration_seconds", f'stage="{stage}",')
+            return "\n".join(out) + "\n"
+
+
+def _esc(v):
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+class CrawlRecorder:
+    def __init__(self, crawl_id, seed_url=None, batch_size=None):
+        self.crawl_id = crawl_id
+        self.seed_url = seed_url
+        self.batch_size = batch_size or LOG_BATCH_SIZE
+        self.started_at = datetime.utcnow()
+        self.fetches = 0
+        self.errors = 0
+        self.bytes = 0
+        self.by_domain = {}
+        # 記録 / 再生中のクロールでは services.archive の ArchiveWriter / ArchiveReader
+        self.archive = None
+        # force_refresh 指定のクロールでは HTTP キャッシュの有効期限内の本文を使わない（条件付き GET で確認する）
+        self.force_refresh = False
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def add(self, rec):
+        with self._lock:
+            self._buffer.append(rec)
+            self.fetches += 1
+            self.errors += 1 if rec["error"] else 0
+            self.bytes += rec["bytes"]
+            self.by_domain[rec["host"]] = self.by_domain.get(rec["host"], 0) + 1
+
+    def counts(self):
+        with self._lock:
+            return {"fetches": self.fetches, "errors": self.errors, "bytes": self.bytes,
+                    "by_domain": dict(self.by_domain)}
+
+    def restore(self, counts, started_at=None):
+        # チェックポイントから再開する場合の集計の引き継ぎ
+        self.fetches = counts.get("fetches", 0)
+        self.errors = counts.get("errors", 0)
+        self.bytes = counts.get("bytes", 0)
+        self.by_domain = dict(counts.get("by_domain", {}))
+        if started_at:
+            self.started_at = started_at
+
+    def flush(self, force=False):
+        # DB への書き込みはアプリケーションコンテキストを持つクロールのメインスレッドから呼ぶ
+        with self._lock:
+            if not self._buffer or (not force and len(self._buffer) < self.batch_size):
+                return
+            rows, self._buffer = self._buffer, []
+        try:
+            db.session.execute(insert(FetchLog), [{**r, "crawl_id": self.crawl_id} for r in rows])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"FetchLog Error: {e}")
+
+    def finish(self, stats):
+        self.flush(force=True)
+        try:
+            db.session.add(CrawlLog(
+                crawl_id=self.crawl_id,
+                seed_url=self.seed_url,
+                started_at=self.started_at,
+                finished_at=datetime.utcnow(),
+                duration_seconds=stats.get("duration_seconds"),
+                pages=stats.get("pages_visited", 0),
+                companies=stats.get("total", 0),
+                inserted=stats.get("inserted", 0),
+                existed=stats.get("existed", 0),
+                fetches=self.fetches,
+                errors=self.errors,
+                bytes=self.bytes,
+                by_domain=json.dumps(self.by_domain, ensure_ascii=False),
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"CrawlLog Error: {e}")
+
+
+# ------------------------------------------------------
+# スレッドごとの状態（どのクロールの取得か / 直近の接続時間 / 直近の取得記録）
+# ------------------------------------------------------
+
+def bind(recorder):
+    _local.recorder = recorder
+
+
+def current():
+    return getattr(_local, "recorder", None)
+
+
+def bound(recorder, fn):
+    # ワーカースレッドで fn を実行する際に recorder を引き継ぐ
+    def run(*args, **kwargs):
+        bind(recorder)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            bind(None)
+    return run
+
+
+def record_connect(dns_seconds, connect_seconds):
+    _local.dns = dns_seconds
+    _local.connect = connect_seconds
+
+
+def start_fetch(url):
+    _local.dns = None
+    _local.connect = None
+    return {
+        "url": url[:1024],
+        "host": urlparse(url).netloc.lower(),
+        "status": None,
+        "cache": "miss",
+        "bytes": 0,
+        "dns_ms": None,
+        "connect_ms": None,
+        "total_ms": None,
+        "decode_ms": None,
+        "parse_ms": None,
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "_t0": time.perf_counter(),
+    }
+
+
+def end_fetch(rec, status=None, nbytes=0, cache=None, decode_seconds=None, error=None):
+    rec["total_ms"] = (time.perf_counter() - rec.pop("_t0")) * 1000
+    rec["status"] = status
+    rec["bytes"] = nbytes
+    if cache:
+        rec["cache"] = cache
+    if getattr(_local, "dns", None) is not None:
+        rec["dns_ms"] = _local.dns * 1000
+        rec["connect_ms"] = _local.connect * 1000
+    if decode_seconds is not None:
+        rec["decode_ms"] = decode_seconds * 1000
+    if error:
+        rec["error"] = error[:255]
+
+    REGISTRY.observe_fetch(rec)
+    recorder = current()
+    if recorder:
+        recorder.add(rec)
+    _local.last = rec
+
+
+def observe_parse(seconds):
+    # 直前に同じスレッドで取得したページのパース時間として記録する
+    REGISTRY.observe_stage("parse", seconds)
+    rec = getattr(_local, "last", None)
+    if rec is not None:
+        rec["parse_ms"] = seconds * 1000
+        _local.last = None
@@ -0,0 +1,145 @@
+import json, os, socket, time, uuid, traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+from models import db
+from models.job import CrawlJob
+from services.scraper import crawl_and_export
+from services.distributed import is_distributed, seed
+
+# ======================================================
+# クロールジョブ
+#   ・/scraping/crawl はジョブを登録して即座に job_id を返す
+#   ・実際のクロールはプロセス内のワーカープールで実行
+#   ・進捗は crawl_jobs テーブルに書き込むため、どの gunicorn ワーカーからでも参照可能
+#   ・失敗 / 中断したジョブはチェックポイントから再開できる
+#       running : 進捗（ハートビート）が CRAWL_JOB_STALE_SECONDS 以上更新されていない / 実行中のプロセスが無い
+#       queued  : キューに入れたプロセスが無い（同じホストで pid が存在しない）。待ち時間の長さでは判定しない
+#   ・distributed=True のジョブは共有フロンティアに投入するだけで、処理は flask crawl-worker が行う
+# ======================================================
+
+JOB_WORKERS = int(os.getenv("CRAWL_JOB_WORKERS", "2"))
+PROGRESS_INTERVAL = 1.0
+STALE_SECONDS = int(os.getenv("CRAWL_JOB_STALE_SECONDS", "300"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="crawl-job")
+
+
+def _owner():
+    # gunicorn の各ワーカー（fork 後）で異なる値になるよう、呼び出し時に求める
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_gone(owner):
+    # 同じホストのプロセスのみ生存を確認できる（別ホスト / 記録の無いジョブは「不明」として扱う）
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def ensure_owner_column():
+    # owner 列の無い crawl_jobs（この列の追加前に作成したテーブル）に列を追加する
+    if "owner" in {c["name"] for c in inspect(db.engine).get_columns("crawl_jobs")}:
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE crawl_jobs ADD COLUMN owner VARCHAR(128)"))
+
+
+def submit_crawl(app, **params):
+    job = CrawlJob(id=uuid.uuid4().hex, status="queued", params=json.dumps(params, ensure_ascii=False),
+                   owner=_owner())
+    db.session.add(job)
+    db.session.commit()
+    if params.get("distributed"):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        seed(job)
+    else:
+        _executor.submit(_run, app, job.id)
+    return job.id
+
+
+def get_job(job_id):
+    return db.session.get(CrawlJob, job_id)
+
+
+def resumable(job):
+    if is_distributed(job):
+        # 状態は共有フロンティアにあるため、ワーカーを起動すれば続きから処理される
+        return False
+    if job.status == "failed":
+        return True
+    if job.status == "queued":
+        # キューで順番待ちのジョブは、キューを持つプロセスが無くなった場合だけ再開する（二重実行を防ぐ）
+        return _owner_gone(job.owner)
+    if job.status == "running":
+        # 実行中のまま進捗が止まっている / 実行していたプロセスが無い = ワーカーが落ちた
+        stale = job.updated_at is not None and (datetime.utcnow() - job.updated_at).total_seconds() > STALE_SECONDS
+        return stale or _owner_gone(job.owner)
+    return False
+
+
+def resume_crawl(app, job_id):
+    job = get_job(job_id)
+    if not job or not resumable(job):
+        return False
+    job.status = "queued"
+    job.error = None
+    job.finished_at = None
+    job.owner = _owner()
+    db.session.commit()
+    _executor.submit(_run, app, job.id, True)
+    return True
+
+
+def _run(app, job_id, resume=False):
+    with app.app_context():
+        job = db.session.get(CrawlJob, job_id)
+        if not job:
+            return
+        job.status = "running"
+        job.owner = _owner()
+        job.started_at = job.started_at if resume and job.started_at else datetime.utcnow()
+        db.session.commit()
+
+        last = [0.0]
+
+        def progress(stats):
+            now = time.time()
+            if now - last[0] < PROGRESS_INTERVAL:
+                return
+            last[0] = now
+            job.pages_visited = stats.get("pages_visited", 0)
+            job.companies_found = stats.get("companies_found", 0)
+            # 件数が変わらなくても更新する（ハートビート。resumable の判定に使う）
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+
+        stats = {}
+        try:
+            params = job.get_params()
+            params.pop("distributed", None)
+            csv_path = crawl_and_export(**params, progress=progress, stats=stats, crawl_id=job.id, resume=resume)
+            job.status = "done"
+            job.csv_path = csv_path
+            job.total = stats.get("total", 0)
+            job.inserted = stats.get("inserted", 0)
+            job.existed = stats.get("existed", 0)
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+
+        job.pages_visited = stats.get("pages_visited", job.pages_visited)
+        job.companies_found = stats.get("companies_found", job.companies_found)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
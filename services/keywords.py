@@ -0,0 +1,120 @@
+import os, re, unicodedata
+from collections import deque
+from functools import lru_cache
+
+# ======================================================
+# キーワード判定（jp_keywords）
+#   ・キーワードはまとめて 1 つの判定器にコンパイルし、本文を 1 回走査するだけで判定
+#     （従来の any(k in text for k in keywords) は「キーワード数 × 本文長」）
+#       search   : 一致の有無。キーワードの選択（|）を 1 つの正規表現にまとめる（re の C 実装で走査）
+#       find_all : 一致したキーワードすべて。Aho-Corasick の失敗遷移を展開した遷移表（DFA）で、
+#                  重なり合う一致（「東京都」と「京都」など）も 1 回の走査で拾う
+#       score    : 一致したキーワードの種類数（取得前の絞り込みで、一覧ページ上のリンクの採点に使う）
+#   ・キーワード・本文とも NFKC 正規化 + 小文字化（全角英数 / 半角カナ / 大文字小文字の違いを吸収）
+#   ・一覧ページ上のリンクについて、リンク文字列と周辺のテキスト（同じ li / tr / dl など）を取り出す
+#     （企業HPを取得する前にキーワードで絞り込むため）
+# ======================================================
+
+CONTEXT_CHARS = int(os.getenv("CRAWL_LINK_CONTEXT_CHARS", "400"))
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def parse_keywords(jp_keywords):
+    if isinstance(jp_keywords, (list, tuple)):
+        return [k.strip() for k in jp_keywords if k and k.strip()]
+    if isinstance(jp_keywords, str):
+        return [k.strip() for k in re.split(r"[,、\n]", jp_keywords) if k.strip()]
+    return []
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in (normalize(k).strip() for k in keywords) if k))
+        self._delta, self._out = _build(self.keywords)
+        self._re = re.compile("|".join(map(re.escape, self.keywords))) if self.keywords else None
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _scan(self, text):
+        delta, out = self._delta, self._out
+        s = 0
+        for ch in normalize(text):
+            s = delta[s].get(ch, 0)
+            if out[s]:
+                yield out[s]
+
+    def search(self, text):
+        return self._re is not None and self._re.search(normalize(text)) is not None
+
+    def find_all(self, text):
+        found = set()
+        for ids in self._scan(text):
+            found.update(ids)
+        return {self.keywords[i] for i in found}
+
+    def score(self, text):
+        # 一致したキーワードの種類数
+        return len(self.find_all(text))
+
+
+def _build(keywords):
+    goto = [{}]
+    out = [()]
+    for i, kw in enumerate(keywords):
+        s = 0
+        for ch in kw:
+            t = goto[s].get(ch)
+            if t is None:
+                t = goto[s][ch] = len(goto)
+                goto.append({})
+                out.append(())
+            s = t
+        out[s] += (i,)
+
+    # 失敗遷移を幅優先で求め、遷移表に展開する（ルートへ戻る遷移は持たない）
+    fail = [0] * len(goto)
+    delta = [dict(g) for g in goto]
+    queue = deque(goto[0].values())
+    while queue:
+        s = queue.popleft()
+        for ch, t in delta[fail[s]].items():
+            if ch not in goto[s]:
+                delta[s][ch] = t
+        for ch, t in goto[s].items():
+            fail[t] = delta[fail[s]].get(ch, 0)
+            out[t] += out[fail[t]]
+            queue.append(t)
+    return delta, out
+
+
+@lru_cache(maxsize=32)
+def _compiled(keywords):
+    return KeywordMatcher(keywords)
+
+
+def compile_keywords(jp_keywords):
+    # 同じキーワードの組み合わせはプロセス内で使い回す
+    return _compiled(tuple(parse_keywords(jp_keywords)))
+
+
+def link_context(a, max_chars=CONTEXT_CHARS):
+    # リンク文字列と、リンクを含むブロック（li / tr / dl など 1 企業分）のテキスト
+    # 別の URL へのリンクを含む / max_chars を超える手前の祖先までを 1 企業分とみなす
+    href = a.get("href")
+    text = a.text_content()
+    parent = a.getparent()
+    while parent is not None and parent.tag not in ("body", "html"):
+        if any(x.get("href") not in (None, href) for x in parent.iter("a")):
+            break
+        t = parent.text_content()
+        if len(t) > max_chars:
+            break
+        text = t
+        parent = parent.getparent()
+    title = a.get("title") or ""
+    return _SPACE_RE.sub(" ", f"{title} {text}").strip()
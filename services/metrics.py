@@ -0,0 +1,180 @@
+from datetime import date, timedelta, timezone
+from urllib.parse import urlparse
+from sqlalchemy import case, func, and_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db
+from models.company import Company
+from models.job import CrawlJob
+from models.metrics import DailyHostStat, DailyCrawlStat
+
+# ======================================================
+# グラフ用の集計値（事前集計）
+#   ・企業の新規登録時に「日付 × 取得元ホスト」単位の件数・項目充足数を加算
+#   ・クロール完了時に日別の実行回数・所要時間を加算
+#   ・/graphs/api/metrics は集計テーブルのみを読む（companies を毎回 GROUP BY しない）
+#   ・flask rebuild-metrics で既存データから作り直し可能（取得元ホスト別の集計がある日はそのまま残す）
+#   ・日付はすべてコンテナのローカル時刻（TZ=Asia/Tokyo）の日付で区切る
+#     （companies.created_at は DB の NOW()、crawl_jobs の時刻は UTC で保存されているため変換して集計）
+# ======================================================
+
+HOST_FIELDS = ("companies", "with_email", "with_phone", "with_contact")
+CRAWL_SUM_FIELDS = ("runs", "total_seconds", "pages", "companies")
+
+
+def _upsert(model, keys, values, sum_fields, max_fields=()):
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        mod = sqlite if dialect == "sqlite" else postgresql
+        stmt = mod.insert(table).values(values)
+        greatest = func.max if dialect == "sqlite" else func.greatest
+        updates = {c: table.c[c] + stmt.excluded[c] for c in sum_fields}
+        updates.update({c: greatest(table.c[c], stmt.excluded[c]) for c in max_fields})
+        db.session.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates))
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table).values(values)
+        updates = {c: table.c[c] + stmt.inserted[c] for c in sum_fields}
+        updates.update({c: func.greatest(table.c[c], stmt.inserted[c]) for c in max_fields})
+        db.session.execute(stmt.on_duplicate_key_update(updates))
+    else:
+        row = db.session.query(model).filter_by(**{k: values[k] for k in keys}).first()
+        if row is None:
+            db.session.add(model(**values))
+        else:
+            for c in sum_fields:
+                setattr(row, c, getattr(row, c) + values[c])
+            for c in max_fields:
+                setattr(row, c, max(getattr(row, c), values[c]))
+
+
+def source_host_of(url):
+    return urlparse(url or "").netloc.lower().replace("www.", "")
+
+
+def record_companies(rows, source_host="", day=None):
+    # rows は company_store.company_row() 形式。呼び出し元のトランザクション内で加算する
+    if not rows:
+        return
+    values = {
+        "day": day or date.today(),
+        "source_host": source_host or "",
+        "companies": len(rows),
+        "with_email": sum(1 for r in rows if r.get("email")),
+        "with_phone": sum(1 for r in rows if r.get("phone")),
+        "with_contact": sum(1 for r in rows if r.get("inquiry_url")),
+    }
+    _upsert(DailyHostStat, ["day", "source_host"], values, HOST_FIELDS)
+
+
+def record_crawl(duration_seconds, pages=0, companies=0, day=None):
+    values = {
+        "day": day or date.today(),
+        "runs": 1,
+        "total_seconds": float(duration_seconds or 0),
+        "max_seconds": float(duration_seconds or 0),
+        "pages": pages or 0,
+        "companies": companies or 0,
+    }
+    try:
+        _upsert(DailyCrawlStat, ["day"], values, CRAWL_SUM_FIELDS, ["max_seconds"])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Metrics Error: {e}")
+
+
+def rebuild():
+    # 企業データには取得元が残っていないため、取得元ホスト別の行（保存時に加算したもの）がある日はそのまま残し、
+    # それ以外の日だけを source_host 空（不明）として companies から作り直す
+    host_days = {d for (d,) in db.session.query(DailyHostStat.day).filter(DailyHostStat.source_host != "").distinct()}
+    db.session.query(DailyHostStat).filter(DailyHostStat.day.not_in(host_days)).delete(synchronize_session=False)
+    db.session.query(DailyCrawlStat).delete()
+
+    def filled(col):
+        return func.sum(case((and_(col.isnot(None), col != ""), 1), else_=0))
+
+    day = func.date(Company.created_at)
+    grouped = (
+        db.session.query(day, func.count(Company.id), filled(Company.email), filled(Company.phone),
+                         filled(Company.inquiry_url))
+        .filter(Company.created_at.isnot(None))
+        .group_by(day)
+    )
+    host_rows = 0
+    for d, companies, with_email, with_phone, with_contact in grouped:
+        d = _as_date(d)
+        if d in host_days:
+            continue
+        db.session.add(DailyHostStat(
+            day=d, source_host="", companies=companies or 0, with_email=with_email or 0,
+            with_phone=with_phone or 0, with_contact=with_contact or 0,
+        ))
+        host_rows += 1
+
+    crawl = {}
+    jobs = db.session.query(CrawlJob).filter(CrawlJob.status == "done", CrawlJob.started_at.isnot(None))
+    for job in jobs:
+        # live の record_crawl はクロール完了時に加算するため、完了日で集計する
+        d = _local_date(job.finished_at or job.started_at)
+        s = crawl.setdefault(d, DailyCrawlStat(day=d, runs=0, total_seconds=0, max_seconds=0, pages=0, companies=0))
+        seconds = job.elapsed_seconds()
+        s.runs += 1
+        s.total_seconds += seconds
+        s.max_seconds = max(s.max_seconds, seconds)
+        s.pages += job.pages_visited or 0
+        s.companies += job.companies_found or 0
+    db.session.add_all(crawl.values())
+    db.session.commit()
+    return host_rows, len(crawl)
+
+
+def summary(days=30):
+    since = date.today() - timedelta(days=days - 1)
+    host_stats = db.session.query(DailyHostStat).filter(DailyHostStat.day >= since).all()
+    crawl_stats = db.session.query(DailyCrawlStat).filter(DailyCrawlStat.day >= since).order_by(DailyCrawlStat.day).all()
+
+    daily = {}
+    hosts = {}
+    totals = dict.fromkeys(HOST_FIELDS, 0)
+    for s in host_stats:
+        key = s.day.isoformat()
+        daily[key] = daily.get(key, 0) + s.companies
+        hosts[s.source_host] = hosts.get(s.source_host, 0) + s.companies
+        for f in HOST_FIELDS:
+            totals[f] += getattr(s, f)
+
+    n = totals["companies"] or 1
+    return {
+        "since": since.isoformat(),
+        "daily": [{"day": k, "companies": daily[k]} for k in sorted(daily)],
+        "hosts": [{"host": h, "companies": c} for h, c in sorted(hosts.items(), key=lambda x: -x[1])[:20]],
+        "fill_rates": {
+            "email": round(totals["with_email"] / n, 3),
+            "phone": round(totals["with_phone"] / n, 3),
+            "contact_url": round(totals["with_contact"] / n, 3),
+        },
+        "total_companies": totals["companies"],
+        "crawls": [
+            {
+                "day": s.day.isoformat(),
+                "runs": s.runs,
+                "avg_seconds": round(s.total_seconds / s.runs, 2) if s.runs else 0,
+                "max_seconds": round(s.max_seconds, 2),
+                "pages": s.pages,
+                "companies": s.companies,
+            }
+            for s in crawl_stats
+        ],
+    }
+
+
+def _local_date(utc_naive):
+    # UTC で保存した naive datetime を、live の集計（date.today()）と同じローカル日付にする
+    return utc_naive.replace(tzinfo=timezone.utc).astimezone().date()
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
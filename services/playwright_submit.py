@@ -0,0 +1,446 @@
+import asyncio, os, re, socket, time, traceback
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from sqlalchemy import and_, or_, update
+
+from models import db
+from models.company import Company
+from models.submission import Submission
+from services.company_store import insert_ignore
+from services.dedup import is_duplicate
+
+# ======================================================
+# お問い合わせフォームへの一括送信
+#   ・Playwright のブラウザコンテキストを複数並べて並列に送信
+#   ・同じホストへは同時に 1 件まで、かつ前回の送信から HOST_INTERVAL 秒以上空ける
+#   ・送信状態は submissions テーブル（企業ごとに 1 行）で管理し、再実行しても二重送信しない
+#       pending → sending → sent / failed / skipped / unknown
+#     ・送信ボタンを押す前の失敗だけを failed（再試行可）にする
+#     ・送信ボタンを押した後に完了を確認できなかった / 送信中に中断した場合は unknown（自動では再送しない）
+#   ・CAPTCHA のあるフォームは送信せず skipped
+# ======================================================
+
+CONCURRENCY = int(os.getenv("SUBMIT_CONCURRENCY", "4"))
+HOST_INTERVAL = float(os.getenv("SUBMIT_HOST_INTERVAL", "30"))
+MAX_ATTEMPTS = int(os.getenv("SUBMIT_MAX_ATTEMPTS", "2"))
+PAGE_TIMEOUT = float(os.getenv("SUBMIT_PAGE_TIMEOUT", "20"))
+SETTLE_TIMEOUT = float(os.getenv("SUBMIT_SETTLE_TIMEOUT", "5"))
+STALE_SECONDS = int(os.getenv("SUBMIT_STALE_SECONDS", "600"))
+CLAIM_BATCH = 200
+USER_AGENT = "Mozilla/5.0"
+
+# 送信者情報のキー（--message で渡す JSON のキー）
+SENDER_KEYS = ("company", "name", "kana", "email", "phone", "zip", "address", "subject", "body")
+
+# 項目名 / ラベルから入力内容を判定（上から順に評価）
+_FIELD_RULES = [
+    ("email_confirm", re.compile(r"(mail|メール).*(確認|confirm|再入力|もう一度)|(確認|confirm).*(mail|メール)", re.I)),
+    ("email", re.compile(r"e-?mail|メール", re.I)),
+    ("phone", re.compile(r"tel|phone|電話|携帯", re.I)),
+    ("zip", re.compile(r"zip|postal|郵便", re.I)),
+    ("address", re.compile(r"address|住所|所在地", re.I)),
+    ("kana", re.compile(r"kana|furigana|フリガナ|ふりがな|カナ", re.I)),
+    ("company", re.compile(r"company|corp|organi[sz]ation|会社|貴社|御社|法人|団体|勤務先", re.I)),
+    ("subject", re.compile(r"subject|title|件名|題名|タイトル", re.I)),
+    ("body", re.compile(r"message|body|content|inquiry|comment|内容|本文|問い?合わ?せ|ご用件|ご質問|備考", re.I)),
+    ("name", re.compile(r"name|氏名|名前|担当者|ご担当", re.I)),
+]
+_AGREE_RE = re.compile(r"同意|agree|privacy|プライバシー|個人情報|consent|承諾", re.I)
+_OTHER_OPTION_RE = re.compile(r"その他|other|営業|ご提案|お問い合わせ", re.I)
+_THANKS_RE = re.compile(
+    r"ありがとうございま|送信(が)?(完了|しました|いたしました|されました)|受け?付け(ました|いたしました)|"
+    r"thank\s*you|has been sent|successfully", re.I,
+)
+_THANKS_URL_RE = re.compile(r"thanks|thank-you|complete|finish|done|kanryo", re.I)
+
+# フォームの候補を探し、入力欄・送信ボタンに番号を振って返す（ページ内で実行）
+_COLLECT_JS = r"""
+() => {
+  const captcha = !!document.querySelector(
+    '.g-recaptcha, .h-captcha, .cf-turnstile, iframe[src*="recaptcha/api2/anchor"], iframe[src*="hcaptcha"], iframe[src*="challenges.cloudflare.com"]');
+  const forms = Array.from(document.forms).filter(f => f.querySelector('input, textarea'));
+  if (!forms.length) return null;
+  const score = f => (f.querySelector('textarea') ? 100 : 0) + f.querySelectorAll('input, select, textarea').length;
+  const form = forms.sort((a, b) => score(b) - score(a))[0];
+  const text = el => (el ? (el.innerText || el.textContent || '') : '').replace(/\s+/g, ' ').trim();
+  const labelOf = el => {
+    const parts = [];
+    if (el.id) {
+      const l = document.querySelector('label[for="' + CSS.escape(el.id) + '"]');
+      if (l) parts.push(text(l));
+    }
+    const wrap = el.closest('label');
+    if (wrap) parts.push(text(wrap));
+    const tr = el.closest('tr');
+    if (tr && tr.querySelector('th')) parts.push(text(tr.querySelector('th')));
+    const dd = el.closest('dd');
+    if (dd && dd.previousElementSibling) parts.push(text(dd.previousElementSibling));
+    return parts.join(' ').slice(0, 200);
+  };
+  const fields = [];
+  let idx = 0;
+  for (const el of form.querySelectorAll('input, textarea, select')) {
+    if (el.disabled) continue;
+    el.setAttribute('data-submit-idx', idx);
+    fields.push({
+      idx: idx++,
+      tag: el.tagName.toLowerCase(),
+      type: (el.getAttribute('type') || '').toLowerCase(),
+      name: el.name || '',
+      id: el.id || '',
+      placeholder: el.placeholder || '',
+      label: labelOf(el),
+      required: el.required || el.getAttribute('aria-required') === 'true' || /必須|required|\*/i.test(labelOf(el)),
+      options: el.tagName === 'SELECT' ? Array.from(el.options).map(o => [o.value, text(o)]) : [],
+      value: el.value || '',
+    });
+  }
+  const buttons = Array.from(form.querySelectorAll('button, input[type=submit], input[type=image]'))
+    .filter(b => (b.getAttribute('type') || 'submit').toLowerCase() !== 'reset' && (b.getAttribute('type') || '').toLowerCase() !== 'button');
+  let submit = null;
+  if (buttons.length) {
+    buttons[buttons.length - 1].setAttribute('data-submit-button', '1');
+    submit = text(buttons[buttons.length - 1]) || buttons[buttons.length - 1].value || '';
+  }
+  return {captcha: captcha, fields: fields, submit: submit};
+}
+"""
+
+# 送信後のページ状態（完了表示 / 確認画面の送信ボタン）
+_RESULT_JS = r"""
+() => {
+  const body = (document.body ? document.body.innerText : '').replace(/\s+/g, ' ').slice(0, 5000);
+  let confirm = false;
+  for (const b of document.querySelectorAll('button, input[type=submit], input[type=image]')) {
+    const label = (b.innerText || b.value || b.alt || '').trim();
+    if (/送信|submit|send|確定/i.test(label) && !/戻|back|修正/i.test(label)) {
+      b.setAttribute('data-submit-confirm', '1');
+      confirm = true;
+      break;
+    }
+  }
+  return {text: body, confirm: confirm, textarea: !!document.querySelector('textarea:not([readonly])')};
+}
+"""
+
+
+class FormError(Exception):
+    # 送信ボタンを押す前に失敗した（再試行してよい）
+    pass
+
+
+def _classify(field):
+    hay = " ".join([field["name"], field["id"], field["placeholder"], field["label"]])
+    if field["tag"] == "textarea":
+        return "body"
+    if field["type"] == "email":
+        return "email_confirm" if _FIELD_RULES[0][1].search(hay) else "email"
+    if field["type"] == "tel":
+        return "phone"
+    for key, pattern in _FIELD_RULES:
+        if pattern.search(hay):
+            return key
+    return None
+
+
+def plan_fields(fields, values):
+    # ページから集めた入力欄に対して、入力 / チェック / 選択の操作を決める
+    actions = []
+    missing = []
+    has_body = False
+    radios = set()
+    for f in fields:
+        kind = f["type"]
+        if kind in ("hidden", "submit", "button", "image", "reset", "file", "password"):
+            continue
+        hay = " ".join([f["name"], f["id"], f["label"]])
+        if f["tag"] == "select":
+            if f["required"] or not f["value"]:
+                options = [(v, t) for v, t in f["options"] if v]
+                if options:
+                    choice = next((v for v, t in options if _OTHER_OPTION_RE.search(t)), options[0][0])
+                    actions.append(("select", f["idx"], choice))
+            continue
+        if kind == "checkbox":
+            if f["required"] or _AGREE_RE.search(hay):
+                actions.append(("check", f["idx"], None))
+            continue
+        if kind == "radio":
+            if f["name"] not in radios:
+                radios.add(f["name"])
+                actions.append(("check", f["idx"], None))
+            continue
+
+        key = _classify(f)
+        value = values.get("email" if key == "email_confirm" else key) if key else None
+        if value:
+            actions.append(("fill", f["idx"], value))
+            has_body = has_body or key == "body"
+        elif f["required"]:
+            missing.append(f["label"] or f["name"] or f["id"])
+    return actions, missing, has_body
+
+
+def message_values(message, company):
+    values = {k: message.get(k, "") for k in SENDER_KEYS}
+    for k in ("subject", "body"):
+        values[k] = values[k].replace("{company_name}", company.company_name or "")
+    return values
+
+
+def enqueue_all(company_ids=None):
+    # フォーム URL のある企業のうち、まだ submissions に行が無いものを pending で登録
+    # 同一企業の別レコードと判定された企業（company_duplicates）は送信しない
+    query = (
+        db.session.query(Company.id)
+        .outerjoin(Submission, Submission.company_id == Company.id)
+        .filter(Submission.id.is_(None), Company.inquiry_url.isnot(None), Company.inquiry_url != "")
+        .filter(~is_duplicate())
+    )
+    if company_ids:
+        query = query.filter(Company.id.in_(company_ids))
+    ids = [cid for (cid,) in query]
+    added = 0
+    for i in range(0, len(ids), 1000):
+        rows = [{"company_id": cid, "status": "pending"} for cid in ids[i:i + 1000]]
+        added += max(db.session.execute(insert_ignore(Submission, rows, ["company_id"])).rowcount, 0)
+    db.session.commit()
+    return added
+
+
+def _claimable():
+    return or_(
+        Submission.status == "pending",
+        and_(Submission.status == "failed", Submission.attempts < MAX_ATTEMPTS),
+    )
+
+
+def mark_stale():
+    # 送信中のまま止まった行は送信済みかどうか分からないため unknown にする（再送しない）
+    limit = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    n = db.session.execute(
+        update(Submission)
+        .where(Submission.status == "sending", Submission.started_at < limit)
+        .values(status="unknown", error="interrupted while sending")
+    ).rowcount
+    db.session.commit()
+    return n
+
+
+class SubmitEngine:
+    def __init__(self, message, concurrency=None, host_interval=None, limit=None, dry_run=False):
+        self.message = message
+        self.concurrency = max(1, int(concurrency or CONCURRENCY))
+        self.host_interval = HOST_INTERVAL if host_interval is None else host_interval
+        self.limit = limit
+        self.dry_run = dry_run
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.stats = {"sent": 0, "failed": 0, "skipped": 0, "unknown": 0, "dry_run": 0}
+        self._items = []
+        self._last_id = 0
+        self._busy = set()
+        self._last = {}
+        self._claimed = 0
+        self._exhausted = False
+
+    def run(self):
+        mark_stale()
+        start = time.time()
+        asyncio.run(self._main())
+        self.stats["duration_seconds"] = round(time.time() - start, 2)
+        return self.stats
+
+    async def _main(self):
+        from playwright.async_api import async_playwright
+
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            try:
+                contexts = [await browser.new_context(user_agent=USER_AGENT) for _ in range(self.concurrency)]
+                await asyncio.gather(*(self._worker(ctx) for ctx in contexts))
+            finally:
+                await browser.close()
+
+    # --------------------------------------------------
+    # スケジューリング（ホスト単位の同時 1 件 + 送信間隔）
+    # --------------------------------------------------
+
+    def _refill(self):
+        if self._exhausted:
+            return
+        # id 順に前回の続きから読む（今回の実行で処理済み（失敗 / 試行のみ）の企業は再取得しない）
+        rows = (
+            db.session.query(Submission.id, Submission.company_id, Company.inquiry_url)
+            .join(Company, Company.id == Submission.company_id)
+            .filter(_claimable(), Submission.id > self._last_id)
+            .order_by(Submission.id)
+            .limit(CLAIM_BATCH)
+            .all()
+        )
+        db.session.commit()
+        if not rows:
+            self._exhausted = True
+            return
+        self._last_id = rows[-1].id
+        self._items.extend((cid, url, urlparse(url).netloc.lower()) for _, cid, url in rows)
+
+    async def _next(self):
+        while True:
+            if self.limit is not None and self._claimed >= self.limit:
+                return None
+            if not self._items:
+                self._refill()
+                if not self._items:
+                    return None
+            now = time.monotonic()
+            wait = None
+            for i, (cid, url, host) in enumerate(self._items):
+                if host in self._busy:
+                    continue
+                ready = self._last.get(host, 0) + self.host_interval
+                if ready <= now:
+                    del self._items[i]
+                    if self._claim(cid):
+                        self._busy.add(host)
+                        self._claimed += 1
+                        return cid, url, host
+                    break
+                wait = ready - now if wait is None else min(wait, ready - now)
+            else:
+                # 残りはすべて送信間隔待ち / 他のワーカーが処理中のホスト
+                await asyncio.sleep(min(wait or 0.2, 1.0))
+
+    def _claim(self, company_id):
+        # 条件付き UPDATE で取得（別プロセスと同時に実行しても同じ企業には 1 回しか送らない）
+        r = db.session.execute(
+            update(Submission)
+            .where(Submission.company_id == company_id, _claimable())
+            .values(status="sending", lease_owner=self.owner, started_at=datetime.utcnow(),
+                    attempts=Submission.attempts + 1, error=None)
+        )
+        db.session.commit()
+        return r.rowcount > 0
+
+    def _finish(self, company_id, status, error=None):
+        values = {"status": status, "error": (error or "")[:255] or None}
+        if status == "sent":
+            values["sent_at"] = datetime.utcnow()
+        db.session.execute(
+            update(Submission)
+            .where(Submission.company_id == company_id, Submission.status == "sending",
+                   Submission.lease_owner == self.owner)
+            .values(**values)
+        )
+        db.session.commit()
+        self.stats[status if status in self.stats else "failed"] += 1
+
+    async def _worker(self, context):
+        while True:
+            item = await self._next()
+            if item is None:
+                return
+            company_id, url, host = item
+            values = None
+            try:
+                company = db.session.get(Company, company_id)
+                if company is None:
+                    raise FormError("company not found")
+                values = message_values(self.message, company)
+                status, error = await self._submit(context, url, values)
+            except FormError as e:
+                status, error = "failed", str(e)
+            except Exception as e:
+                traceback.print_exc()
+                db.session.rollback()
+                # 送信前（企業の読み込み・本文の作成）の失敗は未送信なので failed、送信中の失敗は送れたか分からないので unknown
+                status, error = "failed" if values is None else "unknown", f"{type(e).__name__}: {e}"
+            finally:
+                self._busy.discard(host)
+                self._last[host] = time.monotonic()
+            if status == "dry_run":
+                # 試行のみ: 状態を元に戻す
+                db.session.execute(
+                    update(Submission).where(Submission.company_id == company_id)
+                    .values(status="pending", attempts=Submission.attempts - 1)
+                )
+                db.session.commit()
+                self.stats["dry_run"] += 1
+                continue
+            self._finish(company_id, status, error)
+            print(f"Submit {status}: {url} {error or ''}")
+
+    # --------------------------------------------------
+    # 1 フォームの送信
+    # --------------------------------------------------
+
+    async def _settle(self, page):
+        try:
+            await page.wait_for_load_state("networkidle", timeout=SETTLE_TIMEOUT * 1000)
+        except Exception:
+            pass
+
+    async def _submit(self, context, url, values):
+        page = await context.new_page()
+        try:
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=PAGE_TIMEOUT * 1000)
+            except Exception as e:
+                raise FormError(f"load failed: {type(e).__name__}")
+            await self._settle(page)
+
+            form = await page.evaluate(_COLLECT_JS)
+            if not form:
+                raise FormError("form not found")
+            if form["captcha"]:
+                return "skipped", "captcha"
+            actions, missing, has_body = plan_fields(form["fields"], values)
+            if not has_body:
+                raise FormError("message field not found")
+            if missing:
+                raise FormError("unfilled required: " + ", ".join(missing)[:200])
+            if form["submit"] is None:
+                raise FormError("submit button not found")
+
+            for action, idx, value in actions:
+                selector = f'[data-submit-idx="{idx}"]'
+                try:
+                    if action == "fill":
+                        await page.fill(selector, value, timeout=3000)
+                    elif action == "check":
+                        await page.check(selector, timeout=3000, force=True)
+                    elif action == "select":
+                        await page.select_option(selector, value, timeout=3000)
+                except Exception as e:
+                    raise FormError(f"{action} failed: {type(e).__name__}")
+
+            if self.dry_run:
+                return "dry_run", None
+
+            # ここから先の失敗は「送信されたか不明」として扱う
+            await page.click('[data-submit-button="1"]', timeout=5000)
+            await self._settle(page)
+            for _ in range(2):
+                state = await page.evaluate(_RESULT_JS)
+                if _THANKS_RE.search(state["text"]) or _THANKS_URL_RE.search(urlparse(page.url).path):
+                    return "sent", None
+                if not state["confirm"] or state["textarea"]:
+                    break
+                # 確認画面 → 送信
+                await page.click('[data-submit-confirm="1"]', timeout=5000)
+                await self._settle(page)
+            return "unknown", "completion not confirmed"
+        finally:
+            await page.close()
+
+
+def run_submissions(message, concurrency=None, host_interval=None, limit=None, dry_run=False):
+    enqueue_all()
+    return SubmitEngine(message, concurrency, host_interval, limit, dry_run).run()
+
+
+def status_by_company(company_ids):
+    if not company_ids:
+        return {}
+    return dict(
+        db.session.query(Submission.company_id, Submission.status).filter(Submission.company_id.in_(company_ids))
+    )
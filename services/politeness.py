@@ -0,0 +1,233 @@
+import os, threading, time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+# ======================================================
+# ホスト単位のアクセス制御（robots.txt / Crawl-delay / 適応的なアクセス間隔）
+#   ・robots.txt はホストごとに 1 回だけ取得して TTL の間キャッシュ（同時に来たスレッドは 1 回の取得を待つ）
+#       200: 記載どおり / 4xx: 制限なし / 5xx・429・通信エラー: 全体を不許可（短い TTL で再取得）
+#   ・ホストごとの取得間隔は AIMD で調整
+#       応答が速い間は 1 秒あたりの件数を少しずつ増やす（加算）
+#       429 / 503 / 通信エラー / 応答の遅延を検知したら半分に下げる（乗算）。Retry-After があれば従う
+#     Crawl-delay がある場合はその間隔より短くしない
+#   ・待ち時間が上限を超えるホストは待たずに諦める（他のホストの取得を止めない）
+# ======================================================
+
+ROBOTS_ENABLED = os.getenv("CRAWL_ROBOTS", "1") == "1"
+ROBOTS_TTL = int(os.getenv("CRAWL_ROBOTS_TTL", str(24 * 3600)))
+ROBOTS_ERROR_TTL = int(os.getenv("CRAWL_ROBOTS_ERROR_TTL", "600"))
+ROBOTS_TIMEOUT = 5
+ROBOTS_MAX_BYTES = 512 * 1024
+
+INITIAL_RATE = float(os.getenv("CRAWL_HOST_RATE", "2"))        # 件 / 秒
+MAX_RATE = float(os.getenv("CRAWL_HOST_MAX_RATE", "10"))
+MIN_RATE = float(os.getenv("CRAWL_HOST_MIN_RATE", "0.05"))
+RATE_STEP = float(os.getenv("CRAWL_HOST_RATE_STEP", "0.5"))
+BACKOFF = 0.5
+SLOW_SECONDS = float(os.getenv("CRAWL_HOST_SLOW_SECONDS", "3"))  # これより遅い応答は混雑とみなす
+MAX_WAIT = float(os.getenv("CRAWL_HOST_MAX_WAIT", "30"))
+MAX_RETRY_AFTER = 600
+THROTTLE_STATUSES = {429, 503}
+USER_AGENT = "Mozilla/5.0"
+
+
+def host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+class _Robots:
+    def __init__(self, parser, expires):
+        self.parser = parser
+        self.expires = expires
+
+    def allowed(self, url):
+        return self.parser.can_fetch(USER_AGENT, url)
+
+    def crawl_delay(self):
+        delay = self.parser.crawl_delay(USER_AGENT)
+        if delay is None:
+            rate = self.parser.request_rate(USER_AGENT)
+            if rate and rate.requests:
+                delay = rate.seconds / rate.requests
+        return float(delay) if delay else 0.0
+
+    def sitemaps(self):
+        return list(self.parser.site_maps() or [])
+
+
+def _parser(lines=None, allow_all=False, disallow_all=False):
+    p = RobotFileParser()
+    p.parse(lines or [])
+    p.allow_all = allow_all
+    p.disallow_all = disallow_all
+    return p
+
+
+class RobotsCache:
+    def __init__(self, ttl=ROBOTS_TTL, error_ttl=ROBOTS_ERROR_TTL):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        key = host_key(url)
+        entry = self._entries.get(key)
+        if entry and entry.expires > time.time():
+            return entry
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires > time.time():
+                return entry
+            entry = self._entries[key] = self._fetch(key)
+        return entry
+
+    def _fetch(self, key):
+        from services.fetcher import get_session
+
+        now = time.time()
+        try:
+            r = get_session().get(key + "/robots.txt", timeout=ROBOTS_TIMEOUT, stream=True)
+            try:
+                body = r.raw.read(ROBOTS_MAX_BYTES, decode_content=True) if r.status_code == 200 else b""
+            finally:
+                r.close()
+        except Exception as e:
+            print(f"Robots Error: {key} {type(e).__name__}")
+            return _Robots(_parser(disallow_all=True), now + self.error_ttl)
+
+        if r.status_code == 200:
+            lines = body.decode("utf-8", errors="replace").splitlines()
+            return _Robots(_parser(lines), now + self.ttl)
+        if r.status_code in THROTTLE_STATUSES or r.status_code >= 500:
+            return _Robots(_parser(disallow_all=True), now + self.error_ttl)
+        return _Robots(_parser(allow_all=True), now + self.ttl)
+
+    def allowed(self, url):
+        return self.get(url).allowed(url)
+
+    def crawl_delay(self, url):
+        return self.get(url).crawl_delay()
+
+    def sitemaps(self, url):
+        return self.get(url).sitemaps()
+
+
+class _HostState:
+    __slots__ = ("rate", "next_at", "min_interval", "last_decrease")
+
+    def __init__(self, min_interval=0.0):
+        self.min_interval = min_interval
+        self.rate = INITIAL_RATE
+        self.next_at = 0.0
+        self.last_decrease = 0.0
+
+    def interval(self):
+        return max(1.0 / self.rate, self.min_interval)
+
+
+class HostScheduler:
+    def __init__(self, robots=None):
+        self.robots = robots
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, key):
+        st = self._hosts.get(key)
+        if st is None:
+            st = self._hosts[key] = _HostState()
+        return st
+
+    def ready_in(self, url):
+        # 次に取得できるまでの秒数（予約はしない）
+        st = self._hosts.get(host_key(url))
+        return max(0.0, st.next_at - time.time()) if st else 0.0
+
+    def reserve(self, url, max_wait=MAX_WAIT):
+        # 取得枠を予約し、待つべき秒数を返す。上限を超える場合は予約せずに None
+        key = host_key(url)
+        delay = self.robots.crawl_delay(url) if self.robots else 0.0
+        with self._lock:
+            st = self._state(key)
+            st.min_interval = delay
+            now = time.time()
+            start = max(now, st.next_at)
+            if start - now > max_wait:
+                return None
+            st.next_at = start + st.interval()
+            return start - now
+
+    def wait(self, url, max_wait=MAX_WAIT):
+        delay = self.reserve(url, max_wait)
+        if delay:
+            time.sleep(delay)
+        return delay is not None
+
+    def done(self, url, status=None, seconds=None, retry_after=None):
+        # 取得結果から次の間隔を決める（status=None は通信エラー）
+        key = host_key(url)
+        now = time.time()
+        with self._lock:
+            st = self._state(key)
+            congested = status is None or status in THROTTLE_STATUSES or (seconds or 0) > SLOW_SECONDS
+            if not congested:
+                # 1 件ごとに step / rate 増やす（= 1 秒あたり約 step ずつ増える）
+                st.rate = min(MAX_RATE, st.rate + RATE_STEP / st.rate)
+                return
+            # 同時に返ってきた失敗でまとめて下げすぎないよう、1 間隔に 1 回だけ下げる
+            if now - st.last_decrease >= st.interval():
+                st.rate = max(MIN_RATE, st.rate * BACKOFF)
+                st.last_decrease = now
+            wait = st.interval()
+            if retry_after:
+                wait = max(wait, min(retry_after, MAX_RETRY_AFTER))
+            st.next_at = max(st.next_at, now + wait)
+
+    def rates(self):
+        with self._lock:
+            return {k: round(1.0 / st.interval(), 3) for k, st in self._hosts.items()}
+
+
+def retry_after(value):
+    # Retry-After（秒数 / HTTP 日付）を秒数にする
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_robots = None
+_scheduler = None
+_init_lock = threading.Lock()
+
+
+def get_robots():
+    global _robots
+    if not ROBOTS_ENABLED:
+        return None
+    if _robots is None:
+        with _init_lock:
+            if _robots is None:
+                _robots = RobotsCache()
+    return _robots
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        robots = get_robots()
+        with _init_lock:
+            if _scheduler is None:
+                _scheduler = HostScheduler(robots)
+    return _scheduler
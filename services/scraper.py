@@ -1,9 +1,22 @@
-import csv, os, time, requests, re
+import csv, os, time
+from concurrent.futures import as_completed
+from datetime import datetime, timezone
+from functools import partial
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
 
-from models import db
-from models.company import Company
+from services.company_store import CompanyWriter, db_now, load_known_sites
+from services.fetcher import FetchPool, decode_html, get_session, read_body
+from services.http_cache import get_cache
+from services.politeness import get_robots, get_scheduler, retry_after
+from services.extractor import extract_fields, parse_html
+from services.frontier import Frontier, canonicalize
+from services.metrics import record_crawl
+from services.crawler import render_if_needed
+from services.checkpoint import CHECKPOINT_INTERVAL, save_checkpoint, load_checkpoint, delete_checkpoint
+from services.archive import ArchiveReader, ArchiveWriter, archive_path, current as current_archive
+from services.keywords import compile_keywords, link_context
+from services.sitemap import SITEMAP_ENABLED, discover
+from services import instrumentation
 
 # ======================================================
 # ktff：開発前メモ（TODO：試験後に削除する）
@@ -38,87 +51,225 @@ from models.company import Company
 #   ・重複データが減る
 # ======================================================
 
-_stats = {}
-
-def crawl_and_export(seed_url, allowed_domain=None, limit=100, max_pages=100, jp_keywords=None):
+# 企業ごとの下層ページ取得の上限（ページ数 / 秒）
+MAX_SUBPAGES = int(os.getenv("CRAWL_MAX_SUBPAGES", "4"))
+SUBPAGE_BUDGET = float(os.getenv("CRAWL_SUBPAGE_BUDGET", "8"))
+SUBPAGE_FIELDS = ("contact_url", "email", "phone", "address")
+CSV_HEADERS = ["company_name", "homepage_url", "contact_url", "email", "phone", "address", "source_url"]
+# 一覧ページ上のリンク文字列・周辺テキストがキーワードに合わない企業HPは取得しない（取得前の絞り込み）
+KEYWORD_PREFILTER = os.getenv("CRAWL_KEYWORD_PREFILTER", "0") == "1"
+# 取得前の絞り込みで残すのに必要な、一致したキーワードの種類数（2 にすると「都道府県 + 業種」のように両方が載っている企業だけ）
+PREFILTER_MIN_SCORE = int(os.getenv("CRAWL_PREFILTER_MIN_SCORE", "1"))
+
+def crawl_and_export(seed_url, allowed_domain=None, limit=100, max_pages=100, jp_keywords=None,
+                     concurrency=None, per_host=None, batch_size=None, force_refresh=False,
+                     max_subpages=None, subpage_budget=None, progress=None, stats=None, crawl_id=None,
+                     resume=False, record=False, replay=None, replay_latency=None, prefilter=None,
+                     sitemap=None, sitemap_include=None, sitemap_exclude=None):
+    # stats は呼び出し元ごとの集計（同時実行されても他のクロールと混ざらない）
+    stats = {} if stats is None else stats
     start = time.time()
-    visited = set()
-    queue = [seed_url]
-    rows = []
-
-    filename = f"companies_{time.strftime('%Y%m%d_%H%M%S')}.csv"
-    csv_path = os.path.join(os.getcwd(), filename)
+    # crawl_id（ジョブID）がある場合は途中経過を crawl_checkpoints に保存し、resume=True で続きから再開する
+    checkpoint = load_checkpoint(crawl_id) if crawl_id and resume else None
+    # 取得ごとの計測は fetch_logs、クロール全体の集計は crawl_logs へ（crawl_id はジョブID）
+    recorder = instrumentation.CrawlRecorder(crawl_id or time.strftime("%Y%m%d%H%M%S") + os.urandom(4).hex(), seed_url)
+    recorder.force_refresh = force_refresh
+    instrumentation.bind(recorder)
+    # record=True は取得結果を crawl_archive に保存し、replay=<アーカイブ> はネットワークに出ずに記録から再生する
+    if replay:
+        recorder.archive = replay if isinstance(replay, ArchiveReader) else ArchiveReader(replay, replay_latency)
+    elif record:
+        recorder.archive = ArchiveWriter(archive_path(recorder.crawl_id), {
+            "crawl_id": recorder.crawl_id,
+            "seed_url": seed_url,
+            "params": {"allowed_domain": allowed_domain, "limit": limit, "max_pages": max_pages,
+                       "jp_keywords": jp_keywords, "force_refresh": force_refresh, "max_subpages": max_subpages,
+                       "prefilter": prefilter, "sitemap": sitemap, "sitemap_include": sitemap_include,
+                       "sitemap_exclude": sitemap_exclude},
+        })
+    writing = isinstance(recorder.archive, ArchiveWriter)
+
+    if checkpoint:
+        visited = set(checkpoint["visited"])
+        frontier = Frontier.from_state(checkpoint["frontier"])
+        rows = checkpoint["rows"]
+        csv_path = checkpoint["csv_path"]
+        started_at = datetime.fromisoformat(checkpoint["started_at"])
+        if checkpoint.get("known_before"):
+            known_before = datetime.fromisoformat(checkpoint["known_before"])
+        else:
+            # 旧形式のチェックポイントは UTC の started_at をローカル時刻（DB の時計）に直して使う
+            known_before = started_at.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        elapsed = checkpoint["elapsed"]
+        stats.update(checkpoint["stats"])
+        recorder.restore(checkpoint["recorder"], started_at)
+        print(f"Resumed crawl {crawl_id}: pages={len(visited)} companies={len(rows)} queued={len(frontier)}")
+    else:
+        visited = set()
+        frontier = Frontier()
+        frontier.push(_normalize_url(seed_url))
+        rows = []
+        filename = f"companies_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+        csv_path = os.path.join(os.getcwd(), filename)
+        started_at = datetime.utcnow()
+        # 再開時に「このクロールより前から登録済み」を判定する基準（companies.created_at と同じ DB の時計）
+        known_before = db_now()
+        elapsed = 0.0
     os.makedirs(os.path.dirname(csv_path), exist_ok=True)
 
-    keywords = []
-    if isinstance(jp_keywords, list):
-        keywords = [k.strip() for k in jp_keywords if k.strip()]
-    elif isinstance(jp_keywords, str):
-        keywords = [k.strip() for k in re.split(r"[,\\n]", jp_keywords) if k.strip()]
+    keywords = compile_keywords(jp_keywords)
+    prefilter = (KEYWORD_PREFILTER if prefilter is None else prefilter) and bool(keywords)
 
     seed_host = urlparse(seed_url).netloc.replace("www.", "").lower()
 
-    while queue and len(rows) < limit and len(visited) < max_pages:
-        url = queue.pop(0)
-        url = _normalize_url(url)
-        if url in visited:
-            continue
-        visited.add(url)
+    pool = FetchPool(concurrency, per_host, recorder=recorder)
+    max_subpages = MAX_SUBPAGES if max_subpages is None else max_subpages
+    extract = partial(_extract_company_info, pool=pool, max_subpages=max_subpages, budget=subpage_budget)
+    writer = CompanyWriter(batch_size, update_existing=force_refresh, source_host=seed_host)
+
+    # DB 登録済みの企業HPは通信前にスキップ（force_refresh の場合は再取得して更新）
+    # 再開時は、このクロール自身が中断前に保存した企業を既知扱いにしない
+    known = set() if force_refresh else load_known_sites(known_before if checkpoint else None)
+    # 今回のクロールで抽出済みの企業HP（別の一覧ページに再掲されていても再取得しない）
+    extracted = dict.fromkeys(checkpoint["extracted"]) if checkpoint else {}
+    stats.setdefault("skipped_known", 0)
+    stats.setdefault("skipped_prefilter", 0)
+    stats.setdefault("sitemap_urls", 0)
+    if checkpoint:
+        writer.restore(checkpoint["writer"])
+
+    # 抽出結果は見つかった時点で CSV に追記する（中断しても途中までの結果が残る）
+    partial_csv = _PartialCsv(csv_path, rows)
+
+    def save():
+        # ページ処理の区切りでのみ呼ぶ（保存済みのページは再開時に再取得しない）
+        writer.flush()
+        recorder.flush(force=True)
+        partial_csv.flush()
+        save_checkpoint(crawl_id, {
+            "frontier": frontier.state(),
+            "visited": sorted(visited),
+            "extracted": list(extracted),
+            "rows": rows,
+            "csv_path": csv_path,
+            "started_at": started_at.isoformat(),
+            "known_before": known_before.isoformat(),
+            "elapsed": elapsed + time.time() - start,
+            "stats": {k: v for k, v in stats.items()
+                      if k in ("skipped_known", "skipped_prefilter", "sitemap_urls", "pages_visited",
+                               "companies_found")},
+            "writer": writer.counts(),
+            "recorder": recorder.counts(),
+        })
+
+    # sitemap 指定のクロールは、一覧 / 詳細ページを sitemap から読み出してフロンティアに入れ、
+    # 一覧ページ内のリンク（ページ送り / ナビゲーション）は辿らない（sitemap が無いサイトは従来どおり辿る）
+    # sitemap は読みながら使い、フロンティアが空になった時点で残りの取得ページ数分だけ補充する
+    sitemap = SITEMAP_ENABLED if sitemap is None else sitemap
+    discovered = discover(seed_url, sitemap_include, sitemap_exclude) if sitemap else None
+    follow_links = False
+
+    def refill():
+        nonlocal discovered, follow_links
+        if discovered is None:
+            return False
+        added = 0
+        try:
+            for u in discovered:
+                u = _normalize_url(u)
+                if _allowed(u, seed_url, allowed_domain) and frontier.push(u):
+                    added += 1
+                    stats["sitemap_urls"] += 1
+                    if added >= max_pages - len(visited):
+                        return True
+        except Exception as e:
+            # 一覧ページの取得失敗と同じく、読めなかった sitemap は飛ばしてクロールを続ける
+            # （sitemap から漏れた企業を拾えるよう、以降は一覧ページ内のリンクも辿る）
+            print(f"Sitemap Error: {seed_url} {type(e).__name__}: {e}")
+            follow_links = True
+        discovered = None
+        return added > 0
+
+    last_checkpoint = time.time()
+    try:
+        refill()
+        follow_links = follow_links or stats["sitemap_urls"] == 0
+        while (frontier or refill()) and len(rows) < limit and len(visited) < max_pages:
+            if crawl_id and time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                save()
+                last_checkpoint = time.time()
+
+            url = frontier.pop()
+            visited.add(url)
+            stats["pages_visited"] = len(visited)
+            if progress:
+                progress(stats)
+
+            recorder.flush()
+            html = _fetch_page(url)
+            if not html:
+                continue
 
-        html = _fetch(url)
-        if not html:
-            continue
+            try:
+                t0 = time.perf_counter()
+                anchors = [a for a in parse_html(html).iter("a") if a.get("href") is not None]
+                hrefs = [a.get("href") for a in anchors]
+                instrumentation.observe_parse(time.perf_counter() - t0)
+            except Exception:
+                continue
 
-        soup = BeautifulSoup(html, "html.parser")
-        text = soup.get_text(" ", strip=True)
+            homepage_links = []
+            for hp in _extract_homepage_links(hrefs, url, allowed_domain, seed_host):
+                key = canonicalize(hp)
+                if key in extracted:
+                    continue
+                if key in known:
+                    stats["skipped_known"] += 1
+                    extracted[key] = None
+                    continue
+                homepage_links.append(hp)
+            if prefilter:
+                matched = _prefilter(homepage_links, anchors, url, keywords)
+                stats["skipped_prefilter"] += len(homepage_links) - len(matched)
+                homepage_links = matched
+
+            # 一覧ページ内の企業HPはまとめて並列取得し、結果は元の順序で処理する
+            infos = pool.map(extract, homepage_links)
+            for hp, info in zip(homepage_links, infos):
+                extracted[canonicalize(hp)] = info
+            for info in infos:
+                if not info:
+                    continue
 
-        homepage_links = _extract_homepage_links(soup, url, allowed_domain, seed_host)
+                if not _matches(info, keywords):
+                    continue
 
-        for hp in homepage_links:
-            info = _extract_company_info(hp)
-            if not info:
-                continue
+                rows.append(info)
+                stats["companies_found"] = len(rows)
 
-            if keywords:
-                combined = " ".join([
-                    info.get("company_name", ""),
-                    info.get("address", ""),
-                    info.get("homepage_url", "")
-                ])
-                if not any(k in combined for k in keywords):
-                    continue
+                writer.add(info)
+                partial_csv.add(info)
 
-            rows.append(info)
-
-            site = info.get("homepage_url") or info.get("source_url")
-            if site:
-                try:
-                    exists = Company.query.filter_by(company_site=site).first()
-                    if not exists:
-                        db.session.add(Company(
-                            company_name=info.get("company_name") or "",
-                            company_site=site,
-                            inquiry_url=info.get("contact_url") or "",
-                            email=info.get("email") or "",
-                            phone=info.get("phone") or "",
-                        ))
-                        db.session.commit()
-                        print(f"Saved to DB: {site}")
-                    else:
-                        print(f"Already Exists: {site}")
-
-                except Exception as e:
-                    db.session.rollback()
-                    print(f"DB Error for {site}: {e}")
-
-            if len(rows) >= limit:
-                break
+                if len(rows) >= limit:
+                    break
 
-        for a in soup.find_all("a", href=True):
-            next_url = urljoin(url, a["href"])
-            next_url = _normalize_url(next_url)
-            if next_url not in visited and _allowed(next_url, seed_url, allowed_domain):
-                queue.append(next_url)
+            if not follow_links:
+                continue
+            for href in hrefs:
+                next_url = urljoin(url, href)
+                next_url = _normalize_url(next_url)
+                if _allowed(next_url, seed_url, allowed_domain):
+                    frontier.push(next_url)
+    finally:
+        if discovered is not None:
+            discovered.close()
+        pool.close()
+        instrumentation.bind(None)
+        partial_csv.close()
+        if writing:
+            recorder.archive.close()
+
+    stats.update(writer.close())
 
     dedup = {}
     for r in rows:
@@ -127,31 +278,80 @@ def crawl_and_export(seed_url, allowed_domain=None, limit=100, max_pages=100, jp
             dedup[key] = r
     final_rows = list(dedup.values())
 
-    headers = ["company_name", "homepage_url", "contact_url", "email", "phone", "address", "source_url"]
     with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
         w = csv.writer(f)
-        w.writerow(headers)
+        w.writerow(CSV_HEADERS)
         for r in final_rows:
-            w.writerow([
-                r["company_name"],
-                r["homepage_url"],
-                r["contact_url"],
-                r["email"],
-                r["phone"],
-                r["address"],
-                r["source_url"],
-            ])
-
-    _stats["total"] = len(final_rows)
-    _stats["last_file"] = csv_path
-    _stats["duration_seconds"] = round(time.time() - start, 2)
+            w.writerow([r[h] for h in CSV_HEADERS])
+
+    stats["total"] = len(final_rows)
+    stats["last_file"] = csv_path
+    stats["duration_seconds"] = round(elapsed + time.time() - start, 2)
+    stats["by_domain"] = dict(recorder.by_domain)
+    stats["fetches"] = recorder.fetches
+    stats["fetch_errors"] = recorder.errors
+    if writing:
+        # 再生時に抽出結果を比較できるよう、記録したクロールの結果も保存する
+        recorder.archive.metadata(final_rows, {k: stats.get(k) for k in ("pages_visited", "total", "fetches")})
+        recorder.archive.close()
+        stats["archive"] = recorder.archive.path
+    record_crawl(stats["duration_seconds"], len(visited), len(final_rows))
+    recorder.finish(stats)
+    if crawl_id:
+        delete_checkpoint(crawl_id)
 
     return csv_path
 
-def _extract_homepage_links(soup, base_url, allowed_domain, seed_host):
+class _PartialCsv:
+    # 再開時はチェックポイント時点の結果で書き直す（チェックポイント後に追記された分は再取得で再度追記される）
+    def __init__(self, csv_path, rows=()):
+        self._f = open(csv_path, "w", newline="", encoding="utf-8-sig")
+        self._w = csv.writer(self._f)
+        self._w.writerow(CSV_HEADERS)
+        self._keys = set()
+        for r in rows:
+            self.add(r)
+        self.flush()
+
+    def add(self, r):
+        key = r["homepage_url"] or r["source_url"]
+        if not key or key in self._keys:
+            return
+        self._keys.add(key)
+        self._w.writerow([r[h] for h in CSV_HEADERS])
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+def _matches(info, keywords):
+    # keywords は compile_keywords() の KeywordMatcher
+    if not keywords:
+        return True
+    combined = " ".join([
+        info.get("company_name") or "",
+        info.get("address") or "",
+        info.get("homepage_url") or ""
+    ])
+    return keywords.search(combined)
+
+def _prefilter(links, anchors, base_url, keywords):
+    # 企業HPへのリンクのうち、リンク文字列・周辺テキスト・URL で一致したキーワードが PREFILTER_MIN_SCORE 種類以上のものだけを残す
+    # （企業HPを取得する前の絞り込み。一覧に企業名・所在地が無いサイトでは取りこぼすため既定では無効）
+    targets = set(links)
+    contexts = {}
+    for a in anchors:
+        key = _normalize_url(urljoin(base_url, a.get("href")))
+        if key in targets:
+            contexts[key] = contexts.get(key, "") + " " + link_context(a)
+    return [hp for hp in links if keywords.score(contexts.get(hp, "") + " " + hp) >= PREFILTER_MIN_SCORE]
+
+def _extract_homepage_links(hrefs, base_url, allowed_domain, seed_host):
     links = []
-    for a in soup.find_all("a", href=True):
-        href = urljoin(base_url, a["href"])
+    for href in hrefs:
+        href = urljoin(base_url, href)
         host = urlparse(href).netloc.replace("www.", "").lower()
 
         if allowed_domain:
@@ -164,35 +364,141 @@ def _extract_homepage_links(soup, base_url, allowed_domain, seed_host):
         if ".co.jp" in host or host.endswith(".jp") or host.endswith(".com"):
             links.append(_normalize_url(href))
 
-    return list(set(links))
+    # 出現順のまま重複を除く（実行ごとに取得・出力の順番が変わらないように）
+    return list(dict.fromkeys(links))
 
-def _extract_company_info(homepage_url):
-    html = _fetch(homepage_url)
+def _extract_company_info(homepage_url, pool=None, max_subpages=0, budget=None):
+    html = _fetch_page(homepage_url)
     if not html:
         return None
 
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(" ", strip=True)
+    t0 = time.perf_counter()
+    fields = extract_fields(html, homepage_url, with_links=True)
+    instrumentation.observe_parse(time.perf_counter() - t0)
+    links = fields.pop("subpage_links", [])
+
+    # 会社概要・アクセス等の下層ページで不足項目を補完する
+    if pool and max_subpages and links and not _all_filled(fields):
+        _fill_from_subpages(fields, links[:max_subpages], pool, budget or SUBPAGE_BUDGET)
 
     return {
-        "company_name": _company_name(soup),
+        "company_name": fields["company_name"],
         "homepage_url": homepage_url,
-        "contact_url": _contact_url(soup, homepage_url),
-        "email": _email(text),
-        "phone": _phone(text),
-        "address": _address(soup, text),
+        "contact_url": fields["contact_url"],
+        "email": fields["email"],
+        "phone": fields["phone"],
+        "address": fields["address"],
         "source_url": homepage_url,
     }
 
+def _all_filled(fields):
+    return all(fields[k] for k in SUBPAGE_FIELDS)
+
+def _fill_from_subpages(fields, links, pool, budget):
+    futures = [pool.submit_subpage(_subpage_fields, u) for u in links]
+    try:
+        for f in as_completed(futures, timeout=budget):
+            sub = f.result()
+            if not sub:
+                continue
+            for k in SUBPAGE_FIELDS:
+                if not fields[k] and sub[k]:
+                    fields[k] = sub[k]
+            if _all_filled(fields):
+                break
+    except TimeoutError:
+        pass
+    finally:
+        # 全項目が揃った / 時間切れの場合、未着手の取得は取り消す
+        for f in futures:
+            f.cancel()
+
+def _subpage_fields(url):
+    html = _fetch_page(url)
+    if not html:
+        return None
+    t0 = time.perf_counter()
+    fields = extract_fields(html, url)
+    instrumentation.observe_parse(time.perf_counter() - t0)
+    return fields
+
+def _fetch_page(url):
+    # 静的 HTML で中身が取れない（JS で描画する）ページのみブラウザで描画する
+    html = _fetch(url)
+    if not html:
+        return html
+    archive = current_archive()
+    if isinstance(archive, ArchiveReader):
+        # 再生時は記録した描画結果を使う（ブラウザは起動しない）
+        return archive.rendered(url) or html
+    rendered = render_if_needed(url, html)
+    if archive and rendered is not html:
+        archive.conversion(url, rendered)
+    return rendered
+
 def _fetch(url):
+    # record 指定のクロールは取得結果をアーカイブに書き、replay 指定のクロールはアーカイブから返す
+    archive = current_archive()
+    if isinstance(archive, ArchiveReader):
+        return archive.fetch(url)
+    text, meta = _fetch_live(url)
+    if archive:
+        archive.response(url, text, **meta)
+    return text
+
+def _fetch_live(url):
+    # 戻り値: (本文, アーカイブ用のメタデータ)
+    rec = instrumentation.start_fetch(url)
+    cache = get_cache()
+    cached = cache.get(url) if cache else None
+    # 再取得（force_refresh）のクロールは有効期限内でもサーバーに確認する（変更が無ければ 304 でキャッシュを使う）
+    recorder = instrumentation.current()
+    if cached and cached.is_fresh() and not (recorder and recorder.force_refresh):
+        instrumentation.end_fetch(rec, 200, 0, cache="hit")
+        return cached.text, {"status": 200, "encoding": cached.encoding}
+
+    # robots.txt で不許可 / ホストの待ち時間が長すぎる場合は取得しない
+    robots = get_robots()
+    if robots and not robots.allowed(url):
+        instrumentation.end_fetch(rec, error="robots")
+        return None, {"error": "robots"}
+    scheduler = get_scheduler()
+    if not scheduler.wait(url):
+        instrumentation.end_fetch(rec, error="throttled")
+        return None, {"error": "throttled"}
+
+    t0 = time.perf_counter()
+    meta = {}
     try:
-        r = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        headers = cached.conditional_headers() if cached else None
+        try:
+            r = get_session().get(url, headers=headers, timeout=10, stream=True)
+        except Exception:
+            scheduler.done(url)
+            raise
+        scheduler.done(url, r.status_code, r.elapsed.total_seconds(), retry_after(r.headers.get("Retry-After")))
+        meta = {"status": r.status_code, "content_type": r.headers.get("Content-Type")}
+        if r.status_code == 304 and cached:
+            r.close()
+            cache.revalidated(url)
+            instrumentation.end_fetch(rec, 304, 0, cache="revalidated")
+            return cached.text, {**meta, "encoding": cached.encoding, "elapsed": time.perf_counter() - t0}
         if r.status_code == 200:
-            r.encoding = r.apparent_encoding or r.encoding
-            return r.text
-    except:
-        return None
-    return None
+            # HTML 以外は本文を読まずに NotHtml、上限を超える本文は切り詰める
+            body = read_body(r)
+            t1 = time.perf_counter()
+            text, encoding = decode_html(body, r.headers.get("Content-Type"))
+            decode = time.perf_counter() - t1
+            if cache:
+                cache.put(url, text, encoding, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+            instrumentation.end_fetch(rec, 200, len(body), decode_seconds=decode)
+            return text, {**meta, "encoding": encoding, "elapsed": time.perf_counter() - t0}
+        r.close()
+        instrumentation.end_fetch(rec, r.status_code, 0, error=f"HTTP {r.status_code}")
+        return None, {**meta, "error": f"HTTP {r.status_code}", "elapsed": time.perf_counter() - t0}
+    except Exception as e:
+        instrumentation.end_fetch(rec, error=type(e).__name__)
+        return None, {**meta, "error": type(e).__name__, "elapsed": time.perf_counter() - t0}
 
 def _normalize_url(u):
     if not u:
@@ -210,59 +516,3 @@ def _allowed(next_url, seed_url, allowed_domain):
 
     seed_host = urlparse(seed_url).netloc.replace("www.", "").lower()
     return seed_host in host
-
-def _company_name(soup):
-    for h in soup.find_all(["h1", "h2"]):
-        t = h.get_text(" ", strip=True)
-        if t:
-            return t
-    if soup.title and soup.title.string:
-        return soup.title.string.strip()
-    og = soup.find("meta", property="og:site_name")
-    if og and og.get("content"):
-        return og["content"].strip()
-    return ""
-
-def _contact_url(soup, base_url):
-    labels = ["お問い合わせ", "お問合せ", "contact", "inquiry"]
-    for a in soup.find_all("a", href=True):
-        label = (a.get_text() or "").strip()
-        href = a["href"].lower()
-        if any(l.lower() in label.lower() for l in labels) or any(x in href for x in ["contact", "inquiry"]):
-            return urljoin(base_url, a["href"])
-    return ""
-
-def _email(text):
-    res = re.findall(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text)
-    return res[0] if res else ""
-
-def _phone(text):
-    res = re.findall(r"\d{2,4}-\d{2,4}-\d{3,4}", text)
-    return res[0] if res else ""
-
-def _address(soup, text):
-    for dl in soup.find_all("dl"):
-        dts = dl.find_all("dt")
-        dds = dl.find_all("dd")
-        for dt, dd in zip(dts, dds):
-            k = dt.get_text(" ", strip=True)
-            v = dd.get_text(" ", strip=True)
-            if "住所" in k or "所在地" in k:
-                return v
-
-    for tr in soup.find_all("tr"):
-        th, td = tr.find("th"), tr.find("td")
-        if th and td:
-            k = th.get_text(" ", strip=True)
-            v = td.get_text(" ", strip=True)
-            if "住所" in k or "所在地" in k:
-                return v
-
-    m = re.search(r"(〒\s*\d{3}-\d{4}[\s　]*[^\n]{0,50})", text)
-    if m:
-        return m.group(1)
-
-    return ""
-
-def get_stats():
-    return _stats
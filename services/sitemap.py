@@ -0,0 +1,191 @@
+import gzip, io, os, re, zlib
+import xml.etree.ElementTree as ET
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+
+from services import instrumentation
+from services.archive import ArchiveReader, current as current_archive
+from services.fetcher import get_session
+from services.frontier import PRIORITY_ARTICLE, score
+from services.politeness import get_robots, get_scheduler, retry_after
+
+# ======================================================
+# sitemap からの URL 収集（一覧サイトの企業一覧 / 企業詳細ページを、リンクを辿らずに集める）
+#   ・sitemap の場所: robots.txt の Sitemap: 行。無ければ /sitemap.xml・/sitemap_index.xml
+#   ・sitemap index（入れ子）は幅優先で辿る（ファイル数は CRAWL_SITEMAP_MAX_FILES まで）
+#   ・読み込みはストリーム（ダウンロードしながら iterparse）で、ファイル全体をメモリに載せない
+#       .xml.gz（gzip ファイル）/ Content-Encoding: gzip / テキスト形式（1 行 1 URL）に対応
+#       展開後 CRAWL_SITEMAP_MAX_BYTES を超える分は読まない
+#   ・URL の絞り込み: include / exclude の正規表現。記事 / ニュース・画像 / PDF などは既定で除外
+#   ・取得は robots.txt / ホストごとのアクセス間隔（politeness）に従い、fetch_logs にも記録する
+#   ・record 指定のクロールでは読み取った URL をアーカイブに保存し、replay 時はそこから返す
+# ======================================================
+
+SITEMAP_ENABLED = os.getenv("CRAWL_SITEMAP", "0") == "1"
+MAX_FILES = int(os.getenv("CRAWL_SITEMAP_MAX_FILES", "50"))
+MAX_URLS = int(os.getenv("CRAWL_SITEMAP_MAX_URLS", "50000"))
+MAX_BYTES = int(os.getenv("CRAWL_SITEMAP_MAX_BYTES", str(50 * 1024 * 1024)))  # sitemap の仕様上の上限
+TIMEOUT = 15
+DEFAULT_PATHS = ("/sitemap.xml", "/sitemap_index.xml")
+
+_FILE_EXT_RE = re.compile(r"\.(pdf|jpe?g|png|gif|webp|svg|ico|zip|lzh|xlsx?|docx?|pptx?|csv|mp3|mp4|mov|css|js)$", re.I)
+
+
+class _Capped(io.RawIOBase):
+    # 展開後のサイズが上限に達したら EOF として扱う
+    def __init__(self, f, limit):
+        super().__init__()
+        self.f = f
+        self.remaining = limit
+        self.bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self.remaining <= 0:
+            return 0
+        data = self.f.read(min(len(b), self.remaining))
+        n = len(data)
+        b[:n] = data
+        self.remaining -= n
+        self.bytes += n
+        return n
+
+
+def sitemap_sources(seed_url):
+    parts = urlsplit(seed_url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    # 再生時は robots.txt を取得せず、記録時に使った sitemap の場所を返す
+    archive = current_archive()
+    if isinstance(archive, ArchiveReader):
+        return [loc for _, loc in archive.sitemap(origin + "/robots.txt")]
+    robots = get_robots()
+    listed = robots.sitemaps(origin + "/") if robots else []
+    sources = list(dict.fromkeys(listed)) or [origin + p for p in DEFAULT_PATHS]
+    if archive:
+        archive.sitemap(origin + "/robots.txt", [("sitemap", u) for u in sources])
+    return sources
+
+
+def wanted(url, include=None, exclude=None):
+    # include / exclude は正規表現（文字列 / コンパイル済み）
+    if _FILE_EXT_RE.search(urlsplit(url).path):
+        return False
+    if exclude and re.search(exclude, url):
+        return False
+    if include:
+        return re.search(include, url) is not None
+    return score(url) != PRIORITY_ARTICLE
+
+
+def read_sitemap(url):
+    # 1 ファイル分の (種類, URL) を読みながら返す。種類は "sitemap"（入れ子の sitemap）/ "url"
+    archive = current_archive()
+    if isinstance(archive, ArchiveReader):
+        yield from archive.sitemap(url)
+        return
+    entries = [] if archive else None
+    try:
+        for entry in _read_live(url):
+            if entries is not None:
+                entries.append(entry)
+            yield entry
+    finally:
+        # 途中で読むのをやめた場合も、そこまでの分を記録する（再生時に同じ位置で止まる）
+        if entries is not None:
+            archive.sitemap(url, entries)
+
+
+def _read_live(url):
+    robots = get_robots()
+    if robots and not robots.allowed(url):
+        return
+    scheduler = get_scheduler()
+    if not scheduler.wait(url):
+        return
+
+    rec = instrumentation.start_fetch(url)
+    try:
+        r = get_session().get(url, timeout=TIMEOUT, stream=True)
+    except Exception as e:
+        scheduler.done(url)
+        instrumentation.end_fetch(rec, error=type(e).__name__)
+        print(f"Sitemap Error: {url} {type(e).__name__}")
+        return
+    scheduler.done(url, r.status_code, r.elapsed.total_seconds(), retry_after(r.headers.get("Retry-After")))
+    if r.status_code != 200:
+        r.close()
+        instrumentation.end_fetch(rec, r.status_code, 0, error=f"HTTP {r.status_code}")
+        return
+
+    stream = None
+    error = None
+    try:
+        # Content-Encoding: gzip は urllib3 が展開し、.xml.gz（gzip ファイル）はここで展開する
+        r.raw.decode_content = True
+        r.raw.auto_close = False  # 読み切った時点で閉じると BufferedReader から読めなくなる
+        raw = io.BufferedReader(r.raw)
+        if raw.peek(2)[:2] == b"\x1f\x8b":
+            raw = io.BufferedReader(gzip.GzipFile(fileobj=raw))
+        stream = _Capped(raw, MAX_BYTES)
+        if raw.peek(64).lstrip(b"\xef\xbb\xbf \t\r\n")[:1] == b"<":
+            yield from _parse_xml(stream)
+        else:
+            yield from _parse_text(stream)
+    except (ET.ParseError, OSError, EOFError, zlib.error, requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        # 壊れた / 上限で切り詰めた / 途中で切断・タイムアウトした sitemap は、そこまでに読めた分を使う
+        error = type(e).__name__
+        print(f"Sitemap Error: {url} {error}")
+    finally:
+        r.close()
+        instrumentation.end_fetch(rec, 200, stream.bytes if stream else 0, error=error)
+
+
+def _parse_xml(stream):
+    root = None
+    for event, el in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = el
+            continue
+        if event != "end":
+            continue
+        tag = el.tag.rsplit("}", 1)[-1]
+        if tag in ("url", "sitemap"):
+            loc = (el.findtext("{*}loc") or "").strip()
+            if loc:
+                yield ("sitemap" if tag == "sitemap" else "url"), loc
+            # 読み終わった要素は捨てる（数万件の sitemap でもメモリを使わない）
+            root.clear()
+
+
+def _parse_text(stream):
+    # テキスト形式の sitemap（1 行 1 URL）
+    for line in io.TextIOWrapper(io.BufferedReader(stream), "utf-8-sig", errors="replace"):
+        line = line.strip()
+        if line.startswith(("http://", "https://")):
+            yield "url", line
+
+
+def discover(seed_url, include=None, exclude=None, max_urls=MAX_URLS, max_files=MAX_FILES):
+    # seed_url のサイトの sitemap に載っているページの URL を、sitemap の記載順に読みながら返す
+    include = re.compile(include) if include else None
+    exclude = re.compile(exclude) if exclude else None
+    queue = deque(sitemap_sources(seed_url))
+    seen = set(queue)
+    files = urls = 0
+    while queue and files < max_files:
+        files += 1
+        for kind, loc in read_sitemap(queue.popleft()):
+            if kind == "sitemap":
+                if loc not in seen:
+                    seen.add(loc)
+                    queue.append(loc)
+            elif wanted(loc, include, exclude):
+                yield loc
+                urls += 1
+                if urls >= max_urls:
+                    return
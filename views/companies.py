@@ -1,24 +1,128 @@
-from flask import Blueprint, render_template, request
+import csv, io, json, time
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, Response, stream_with_context
 from flask_login import login_required
+from models import db
 from models.company import Company
+from models.submission import Submission
+from services.company_search import filter_search, approximate_count
+from services.dedup import is_duplicate
+from services.playwright_submit import status_by_company
 
 companies_bp = Blueprint("companies", __name__, template_folder="../templates/dashboard/companies")
 
 @companies_bp.route("/", methods=["GET"])
 @login_required
 def index():
-    search = request.args.get("search", "")
-    page = request.args.get("page", 1, type=int)
+    search = request.args.get("search", "").strip()
+    cursor = request.args.get("cursor", type=int)  # 次ページ: id < cursor
+    before = request.args.get("before", type=int)  # 前ページ: id > before
     per_page = 100
 
     query = Company.query
     if search:
-        query = query.filter(Company.company_name.like(f"%{search}%"))
+        query = filter_search(query, search)
+
+    # id によるキーセットページング（OFFSET / COUNT を使わない）
+    if before:
+        items = query.filter(Company.id > before).order_by(Company.id.asc()).limit(per_page + 1).all()
+        has_prev = len(items) > per_page
+        companies = list(reversed(items[:per_page]))
+        has_next = True
+    else:
+        if cursor:
+            query = query.filter(Company.id < cursor)
+        items = query.order_by(Company.id.desc()).limit(per_page + 1).all()
+        has_next = len(items) > per_page
+        companies = items[:per_page]
+        has_prev = cursor is not None
+
+    total, capped = approximate_count(search)
+    pager = {
+        "has_prev": has_prev and bool(companies),
+        "has_next": has_next and bool(companies),
+        "prev_args": {"search": search or None, "before": companies[0].id} if companies else {},
+        "next_args": {"search": search or None, "cursor": companies[-1].id} if companies else {},
+        "total": total,
+        "capped": capped,
+    }
 
-    pagination = query.order_by(Company.id.desc()).paginate(page=page, per_page=per_page)
-    
     return render_template(
         "dashboard/companies/index.html",
-        companies=pagination.items,
-        pagination=pagination
-    )
\ No newline at end of file
+        companies=companies,
+        submissions=status_by_company([c.id for c in companies]),
+        pager=pager,
+        search=search,
+    )
+
+
+EXPORT_COLUMNS = ["id", "company_name", "company_site", "inquiry_url", "email", "phone", "created_at"]
+EXPORT_CHUNK = 1000
+
+@companies_bp.get("/export")
+@login_required
+def export():
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return "format は csv または ndjson を指定してください", 400
+
+    query = db.select(*(getattr(Company, c) for c in EXPORT_COLUMNS)).order_by(Company.id)
+    search = request.args.get("search", "").strip()
+    if search:
+        query = filter_search(query, search)
+    try:
+        date_from = _parse_date(request.args.get("date_from"))
+        date_to = _parse_date(request.args.get("date_to"))
+    except ValueError:
+        return "日付は YYYY-MM-DD 形式で指定してください", 400
+    if date_from:
+        query = query.where(Company.created_at >= date_from)
+    if date_to:
+        query = query.where(Company.created_at < date_to + timedelta(days=1))
+    mail_sent = request.args.get("mail_sent")
+    if mail_sent in ("0", "1"):
+        sent = db.exists().where(Submission.company_id == Company.id, Submission.status == "sent")
+        query = query.where(sent if mail_sent == "1" else ~sent)
+    if request.args.get("exclude_duplicates") == "1":
+        query = query.where(~is_duplicate())
+
+    # サーバーサイドカーソルで少しずつ読み出し、一時ファイルを作らずにそのまま返す
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=EXPORT_CHUNK))
+    generate = _csv_lines(result) if fmt == "csv" else _ndjson_lines(result)
+
+    filename = f"companies_export_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    mimetype = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson; charset=utf-8"
+    return Response(
+        stream_with_context(generate),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+def _csv_lines(result):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    # Excel で文字化けしないよう BOM 付き（utf-8-sig）
+    buf.write("\ufeff")
+    w.writerow(EXPORT_COLUMNS)
+    for partition in result.partitions():
+        for row in partition:
+            w.writerow([_value(v) for v in row])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    yield buf.getvalue()
+
+def _ndjson_lines(result):
+    for partition in result.partitions():
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, (_value(v, None) for v in row))), ensure_ascii=False) + "\n"
+            for row in partition
+        )
+
+def _value(v, empty=""):
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    return empty if v is None else v
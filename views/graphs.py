@@ -1,9 +1,16 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required
+from services.metrics import summary
 
 graphs_bp = Blueprint("graphs", __name__)
 
 @graphs_bp.get("/")
 @login_required
 def index():
-    return render_template("dashboard/graphs/index.html")
\ No newline at end of file
+    return render_template("dashboard/graphs/index.html")
+
+@graphs_bp.get("/api/metrics")
+@login_required
+def metrics():
+    days = min(max(request.args.get("days", 30, type=int), 1), 366)
+    return jsonify(summary(days))
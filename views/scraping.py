@@ -1,7 +1,11 @@
-import os, json
-from flask import Blueprint, render_template, request, send_file
+import csv, io, os, re
+from flask import Blueprint, Response, render_template, request, send_file, current_app, url_for, jsonify
 from flask_login import login_required
-from services.scraper import crawl_and_export, get_stats
+from services.jobs import submit_crawl, get_job, resume_crawl
+from services.checkpoint import checkpoint_csv_path
+from services.distributed import is_distributed, result_rows
+from services.keywords import parse_keywords
+from services.scraper import CSV_HEADERS
 
 scraping_bp = Blueprint(
     "scraping",
@@ -21,25 +25,108 @@ def crawl():
     allowed_domain = (request.form.get("allowed_domain") or "").strip() or None
     limit = int(request.form.get("limit") or 100)
     max_pages = int(request.form.get("max_pages") or 100)
+    concurrency = request.form.get("concurrency", type=int)
+    per_host = request.form.get("per_host", type=int)
+    force_refresh = request.form.get("force_refresh") == "1"
+    distributed = request.form.get("distributed") == "1"
+    record = request.form.get("record") == "1"
+    prefilter = request.form.get("prefilter") == "1"
+    sitemap = request.form.get("sitemap") == "1"
+    sitemap_include = (request.form.get("sitemap_include") or "").strip() or None
     jp_keywords_raw = (request.form.get("jp_keywords") or "").strip()
-    jp_keywords = [x.strip() for x in jp_keywords_raw.splitlines() if x.strip()] or [
+    # 「,」「、」区切り / 1 行 1 キーワードのどちらでも受け付ける
+    jp_keywords = parse_keywords(jp_keywords_raw) or [
         "株式会社", "有限会社", "建設", "工務店", "お問い合わせ", "会社概要",
     ]
 
     if not seed_url:
         return "seed_url は必須です", 400
+    if sitemap_include:
+        try:
+            re.compile(sitemap_include)
+        except re.error:
+            return "sitemap の絞り込みの正規表現が正しくありません", 400
 
-    csv_path = crawl_and_export(
+    job_id = submit_crawl(
+        current_app._get_current_object(),
         seed_url=seed_url,
         allowed_domain=allowed_domain,
         limit=limit,
         max_pages=max_pages,
         jp_keywords=jp_keywords,
+        concurrency=concurrency,
+        per_host=per_host,
+        force_refresh=force_refresh,
+        distributed=distributed,
+        record=record,
+        prefilter=prefilter,
+        sitemap=sitemap,
+        sitemap_include=sitemap_include,
     )
 
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("scraping.job_status", job_id=job_id),
+        "download_url": url_for("scraping.job_download", job_id=job_id),
+    }), 202
+
+@scraping_bp.get("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job.to_dict())
+
+@scraping_bp.post("/jobs/<job_id>/resume")
+@login_required
+def job_resume(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({"error": "job not found"}), 404
+    if not resume_crawl(current_app._get_current_object(), job_id):
+        return jsonify({"error": f"job is {job.status}"}), 409
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("scraping.job_status", job_id=job_id),
+        "download_url": url_for("scraping.job_download", job_id=job_id),
+    }), 202
+
+@scraping_bp.get("/jobs/<job_id>/download")
+@login_required
+def job_download(job_id):
+    job = get_job(job_id)
+    if not job:
+        return "ジョブが見つかりません", 404
+    partial = job.status != "done"
+    if is_distributed(job):
+        # 分散クロールの結果は共有フロンティアにある（CSV ファイルはどのワーカーにも残らない）
+        return _distributed_csv(job, partial)
+
+    # 未完了のジョブは最後のチェックポイント時点までの途中結果を返す
+    csv_path = checkpoint_csv_path(job.id) if partial else job.csv_path
+    if not csv_path or not os.path.exists(csv_path):
+        return "CSVはまだ生成されていません", 409
+
     resp = send_file(csv_path, as_attachment=True, download_name=os.path.basename(csv_path))
-    stats = get_stats()
-    resp.headers["X-Request-Count"] = str(stats.get("total", 0))
-    resp.headers["X-Requests-By-Domain"] = json.dumps(stats.get("by_domain", {}), ensure_ascii=False)
-    resp.headers["X-Crawl-Duration-Seconds"] = str(stats.get("duration_seconds", ""))
-    return resp
\ No newline at end of file
+    resp.headers["X-Partial-Result"] = "1" if partial else "0"
+    resp.headers["X-Request-Count"] = str(job.total or 0)
+    resp.headers["X-Crawl-Duration-Seconds"] = str(job.elapsed_seconds())
+    return resp
+
+def _distributed_csv(job, partial):
+    buf = io.StringIO()
+    buf.write("\ufeff")
+    w = csv.writer(buf)
+    w.writerow(CSV_HEADERS)
+    rows = result_rows(job.id)
+    for r in rows:
+        w.writerow([r.get(h, "") for h in CSV_HEADERS])
+
+    filename = f"companies_{job.id}.csv"
+    resp = Response(buf.getvalue(), mimetype="text/csv; charset=utf-8",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+    resp.headers["X-Partial-Result"] = "1" if partial else "0"
+    resp.headers["X-Request-Count"] = str(len(rows))
+    resp.headers["X-Crawl-Duration-Seconds"] = str(job.elapsed_seconds())
+    return resp